@@ -0,0 +1,454 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils import timezone
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL,
+    size INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+CREATE TABLE IF NOT EXISTS cache_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    entries INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO cache_stats VALUES (0, 0, 0);
+CREATE TRIGGER IF NOT EXISTS cache_insert AFTER INSERT ON cache BEGIN
+    UPDATE cache_stats SET entries = entries + 1, size = size + new.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_delete AFTER DELETE ON cache BEGIN
+    UPDATE cache_stats SET entries = entries - 1, size = size - old.size;
+END;
+CREATE TRIGGER IF NOT EXISTS cache_update AFTER UPDATE OF size ON cache BEGIN
+    UPDATE cache_stats SET size = size - old.size + new.size;
+END;
+'''
+
+# Ключ в журнале сбросов, по которому L1 очищается целиком
+FLUSH_ALL = '*'
+
+# Время последнего чтения обновляется не чаще раза в секунду,
+# чтобы чтения почти никогда не брали блокировку на запись.
+ACCESS_GRANULARITY = 1
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite в режиме WAL, общий для всех процессов узла.
+
+    Вытесняет давно не читанные записи (LRU), когда превышены
+    MAX_ENTRIES или OPTIONS['MAX_SIZE'] в байтах. Целые числа хранятся
+    как INTEGER, поэтому incr атомарен и между процессами.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._max_size = options.get('MAX_SIZE')
+        self._busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # После fork соединение родителя использовать нельзя
+        if getattr(self._local, 'pid', None) != os.getpid():
+            db = sqlite3.connect(
+                self._path,
+                timeout=self._busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.executescript(SCHEMA)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return self._local.db
+
+    def _encode(self, value):
+        if type(value) is int:
+            return value, 8
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return data, len(data)
+
+    def _decode(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _write(self, statement, rows, now):
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = db.executemany(statement, rows)
+            self._cull(db, now)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        return cursor.rowcount
+
+    def _cull(self, db, now):
+        entries, size = db.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        over_entries = entries > self._max_entries
+        over_size = self._max_size is not None and size > self._max_size
+        if not (over_entries or over_size):
+            return
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        entries, size = db.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        if entries > self._max_entries:
+            cull = entries
+            if self._cull_frequency:
+                cull = max(entries // self._cull_frequency, 1)
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (cull,),
+            )
+        while self._max_size is not None and size > self._max_size:
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (max(entries // 10, 1),),
+            )
+            entries, size = db.execute(
+                'SELECT entries, size FROM cache_stats'
+            ).fetchone()
+
+    def _set_rows(self, data, timeout, now):
+        expires = self.get_backend_timeout(timeout)
+        for key, value in data.items():
+            encoded, size = self._encode(value)
+            yield key, encoded, expires, now, size
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        rows = list(self._set_rows({key: value}, timeout, now))
+        return bool(self._write(
+            'INSERT INTO cache VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires, accessed = excluded.accessed, '
+            'size = excluded.size WHERE cache.expires <= excluded.accessed',
+            rows, now,
+        ))
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        keys = {}
+        for key, value in data.items():
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            keys[made_key] = value
+        now = time.time()
+        # не INSERT OR REPLACE: замена не вызывает триггер cache_delete,
+        # и счётчики в cache_stats росли бы при каждой перезаписи
+        self._write(
+            'INSERT INTO cache VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires, accessed = excluded.accessed, '
+            'size = excluded.size',
+            list(self._set_rows(keys, timeout, now)), now,
+        )
+        return []
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._get_many([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made_keys = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            made_keys[made_key] = key
+        found = self._get_many(list(made_keys))
+        return {made_keys[key]: value for key, value in found.items()}
+
+    def _get_many(self, keys):
+        if not keys:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._db.execute(
+            f'SELECT key, value, accessed FROM cache '
+            f'WHERE key IN ({placeholders}) '
+            f'AND (expires IS NULL OR expires > ?)',
+            (*keys, now),
+        ).fetchall()
+        stale = [
+            (now, key) for key, value, accessed in rows
+            if now - accessed > ACCESS_GRANULARITY
+        ]
+        if stale:
+            self._db.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', stale
+            )
+        return {key: self._decode(value) for key, value, accessed in rows}
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        cursor = self._db.execute(
+            'UPDATE cache SET expires = ?, accessed = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), now, key, now),
+        )
+        return bool(cursor.rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'UPDATE cache SET value = value + ? WHERE key = ? '
+                "AND typeof(value) = 'integer' "
+                'AND (expires IS NULL OR expires > ?) RETURNING value',
+                (delta, key, time.time()),
+            ).fetchone()
+        finally:
+            db.execute('COMMIT')
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        return row[0]
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._db.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made_keys = []
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            made_keys.append((made_key,))
+        if made_keys:
+            self._db.executemany('DELETE FROM cache WHERE key = ?', made_keys)
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение живёт весь процесс, как у файлового кэша Django
+        pass
+
+
+class TieredCache(BaseCache):
+    """Двухуровневый кэш: маленький L1 в памяти процесса перед общим L2.
+
+    LOCATION — алиас общего кэша из CACHES. Перезапись и удаление ключа
+    дописывают его в журнал core.InvalidationLog; процесс читает журнал
+    не чаще раза в OPTIONS['POLL_INTERVAL'] секунд и выбрасывает эти ключи
+    из L1. Новые ключи в журнал не пишутся: в чужих L1 их нет. Запись в L1
+    живёт не дольше OPTIONS['L1_TIMEOUT'], так что даже пропущенная
+    строка журнала устаревает за ограниченное время.
+
+    Ключи с окончаниями из OPTIONS['L2_ONLY'] (по умолчанию блокировки
+    ':lock') идут мимо L1 и журнала. L1 хранит значения сериализованными,
+    как LocMemCache: изменение полученного объекта не попадает в кэш.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._l2_alias = location
+        self._l1_max_entries = options.get('L1_MAX_ENTRIES', 1000)
+        self._l1_timeout = options.get('L1_TIMEOUT', 30)
+        self._poll_interval = options.get('POLL_INTERVAL', 1)
+        self._log_retention = options.get('LOG_RETENTION', 3600)
+        self._prune_every = options.get('PRUNE_EVERY', 1000)
+        self._l2_only = tuple(options.get('L2_ONLY', (':lock',)))
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_id = None
+        self._synced = 0
+        self._writes = 0
+
+    @property
+    def _l2(self):
+        return caches[self._l2_alias]
+
+    @property
+    def _log(self):
+        # Модель импортируется лениво: бэкенд кэша может быть создан
+        # раньше, чем загрузятся приложения
+        from core.models import InvalidationLog
+        return InvalidationLog
+
+    def _sync(self):
+        now = time.monotonic()
+        if now - self._synced < self._poll_interval:
+            return
+        log = self._log.objects.order_by('pk')
+        with self._lock:
+            if (self._last_id is None
+                    or now - self._synced > self._log_retention):
+                # Журнал мог уже обрезаться: доверять L1 нельзя
+                self._l1.clear()
+                last = log.values_list('pk', flat=True).last()
+                self._last_id = last or 0
+            else:
+                rows = log.filter(pk__gt=self._last_id).values_list(
+                    'pk', 'key'
+                )
+                for pk, key in rows:
+                    if key == FLUSH_ALL:
+                        self._l1.clear()
+                    else:
+                        self._l1.pop(key, None)
+                    self._last_id = pk
+            self._synced = now
+
+    def _is_l2_only(self, key):
+        return key.endswith(self._l2_only)
+
+    def _l1_get(self, key):
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._l1[key]
+                return None
+            self._l1.move_to_end(key)
+        return entry[0], pickle.loads(entry[1])
+
+    def _l1_set(self, key, value, timeout=DEFAULT_TIMEOUT):
+        if self._is_l2_only(key):
+            return
+        timeout = self._l1_timeout if timeout is DEFAULT_TIMEOUT else min(
+            self._l1_timeout if timeout is None else timeout,
+            self._l1_timeout,
+        )
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._l1[key] = (time.monotonic() + timeout, pickled)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _invalidate(self, keys):
+        """Выбрасывает ключи из своего L1 и пишет их в журнал для других."""
+        with self._lock:
+            for key in keys:
+                self._l1.pop(key, None)
+        keys = [key for key in keys if not self._is_l2_only(key)]
+        if not keys:
+            return
+        log = self._log
+        log.objects.bulk_create([log(key=key) for key in keys])
+        self._writes += 1
+        if self._writes % self._prune_every == 0:
+            cutoff = timezone.now() - timedelta(seconds=self._log_retention)
+            log.objects.filter(created__lt=cutoff).delete()
+
+    def get(self, key, default=None, version=None):
+        made_key = self.make_key(key, version=version)
+        if self._is_l2_only(made_key):
+            return self._l2.get(made_key, default)
+        self._sync()
+        entry = self._l1_get(made_key)
+        if entry is not None:
+            return entry[1]
+        value = self._l2.get(made_key)
+        if value is None:
+            return default
+        self._l1_set(made_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            entry = self._l1_get(made_key)
+            if entry is not None:
+                found[key] = entry[1]
+            else:
+                missing[made_key] = key
+        if missing:
+            for made_key, value in self._l2.get_many(missing).items():
+                self._l1_set(made_key, value)
+                found[missing[made_key]] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        made = {
+            self.make_key(key, version=version): value
+            for key, value in data.items()
+        }
+        # в журнал только перезаписи: нового ключа нет ни в чьём L1
+        cached = [key for key in made if not self._is_l2_only(key)]
+        existing = list(self._l2.get_many(cached)) if cached else []
+        self._l2.set_many(made, timeout)
+        self._invalidate(existing)
+        for made_key, value in made.items():
+            self._l1_set(made_key, value, timeout)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        made_key = self.make_key(key, version=version)
+        # добавленного ключа раньше не было, и сбрасывать нечего
+        return self._l2.add(made_key, value, timeout)
+
+    def incr(self, key, delta=1, version=None):
+        made_key = self.make_key(key, version=version)
+        value = self._l2.incr(made_key, delta)
+        self._invalidate([made_key])
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._l2.touch(self.make_key(key, version=version), timeout)
+
+    def has_key(self, key, version=None):
+        return self.get(key, version=version) is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made_keys = [self.make_key(key, version=version) for key in keys]
+        if made_keys:
+            self._l2.delete_many(made_keys)
+            self._invalidate(made_keys)
+
+    def clear(self):
+        self._l2.clear()
+        self._invalidate([FLUSH_ALL])
+        with self._lock:
+            self._l1.clear()
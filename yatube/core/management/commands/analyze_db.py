@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет статистику планировщика, по которой считаются оценки '
+        'числа строк (posts.counts.estimated_count). Запускать по '
+        'расписанию, например раз в час'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--limit', type=int, default=1000,
+            help='SQLite: сколько строк индекса просматривать, 0 — все',
+        )
+
+    def handle(self, *args, database, limit, **options):
+        connection = connections[database]
+        if connection.vendor == 'sqlite':
+            # с ограничением ANALYZE не читает большие таблицы целиком,
+            # а число строк в sqlite_stat1 становится приблизительным
+            statements = [f'PRAGMA analysis_limit = {int(limit)}', 'ANALYZE']
+        elif connection.vendor == 'postgresql':
+            statements = ['ANALYZE']
+        else:
+            raise CommandError(f'{connection.vendor} не поддерживается')
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+        self.stdout.write(f'{database}: статистика обновлена')
@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+
+OPTIONS = {'MAX_ENTRIES': 100000}
+
+
+def make_backend(name, path):
+    if name == 'locmem':
+        return LocMemCache('cache-benchmark', {'OPTIONS': OPTIONS})
+    return SQLiteCache(path, {'OPTIONS': OPTIONS})
+
+
+def worker(name, path, keys, requests, render_time, results):
+    """Имитирует воркер WSGI: читает ключ, при промахе «рендерит» и пишет."""
+    cache = make_backend(name, path)
+    hits = 0
+    start = time.perf_counter()
+    for number in range(requests):
+        key = f'page:{(number * 7919 + os.getpid()) % keys}'
+        if cache.get(key) is not None:
+            hits += 1
+            continue
+        time.sleep(render_time)
+        cache.set(key, 'x' * 2048, None)
+    results.put((hits, time.perf_counter() - start))
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает LocMemCache и SQLiteCache при нескольких процессах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--keys', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument(
+            '--render-time', type=float, default=0.001,
+            help='Стоимость промаха в секундах',
+        )
+
+    def handle(self, *args, processes, keys, requests, render_time,
+               **options):
+        context = multiprocessing.get_context('fork')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite3')
+            for name in ('locmem', 'sqlite'):
+                results = context.Queue()
+                workers = [
+                    context.Process(target=worker, args=(
+                        name, path, keys, requests, render_time, results,
+                    ))
+                    for _ in range(processes)
+                ]
+                start = time.perf_counter()
+                for process in workers:
+                    process.start()
+                stats = [results.get() for _ in workers]
+                for process in workers:
+                    process.join()
+                elapsed = time.perf_counter() - start
+                hits = sum(hit for hit, _ in stats)
+                total = processes * requests
+                self.stdout.write(
+                    f'{name}: {total / elapsed:.0f} запросов/с, '
+                    f'попаданий {hits / total:.1%}, '
+                    f'промахов {total - hits}'
+                )
@@ -0,0 +1,109 @@
+import os
+import random
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core.sqlite import copy_database
+from posts.models import Post
+
+User = get_user_model()
+
+# «До»: настройки SQLite по умолчанию и новое соединение на каждый запрос
+BASELINE = ({'journal_mode': 'delete'}, 0)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность страниц постов на копии базы '
+        'с настройками SQLite по умолчанию и с SQLITE_PRAGMAS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.2,
+            help='Доля запросов на запись (комментарии)',
+        )
+
+    def handle(self, *args, threads, seconds, write_ratio, **options):
+        database = connections.databases['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Бенчмарк рассчитан на SQLite')
+        source = database['NAME']
+        saved = dict(database)
+        tuned = (settings.SQLITE_PRAGMAS, saved.get('CONN_MAX_AGE', 0))
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                for title, (pragmas, max_age) in (
+                    ('до', BASELINE), ('после', tuned),
+                ):
+                    path = os.path.join(directory, f'{title}.sqlite3')
+                    copy_database(source, path)
+                    connections.close_all()
+                    database.update(NAME=path, CONN_MAX_AGE=max_age)
+                    with override_settings(SQLITE_PRAGMAS=pragmas):
+                        stats = self.run(threads, seconds, write_ratio)
+                    connections.close_all()
+                    self.report(title, stats, seconds)
+        finally:
+            database.clear()
+            database.update(saved)
+
+    def run(self, threads, seconds, write_ratio):
+        user, _ = User.objects.get_or_create(username='db-benchmark')
+        post = Post.objects.first() or Post.objects.create(
+            author=user, text='Пост для бенчмарка'
+        )
+        reads = [
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': post.author}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        write = reverse('posts:add_comment', kwargs={'post_id': post.pk})
+        connections.close_all()
+        stats = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def worker():
+            # Не из INTERNAL_IPS, чтобы не мерить debug toolbar
+            client = Client(REMOTE_ADDR='192.0.2.1')
+            client.force_login(user)
+            done = {'reads': 0, 'writes': 0, 'errors': 0}
+            while time.monotonic() < deadline:
+                kind = 'writes' if random.random() < write_ratio else 'reads'
+                try:
+                    if kind == 'writes':
+                        client.post(write, {'text': 'Комментарий'})
+                    else:
+                        client.get(random.choice(reads))
+                    done[kind] += 1
+                except Exception:
+                    done['errors'] += 1
+            connections.close_all()
+            with lock:
+                for key, value in done.items():
+                    stats[key] += value
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return stats
+
+    def report(self, title, stats, seconds):
+        self.stdout.write(
+            f'{title}: чтений {stats["reads"] / seconds:.0f}/с, '
+            f'записей {stats["writes"] / seconds:.0f}/с, '
+            f'ошибок {stats["errors"]}'
+        )
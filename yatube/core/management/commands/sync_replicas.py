@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.sqlite import copy_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет реплики из DATABASE_REPLICAS копией основной базы '
+        'SQLite — для проверки маршрутизации чтения без настоящей репликации'
+    )
+
+    def handle(self, *args, **options):
+        source = connections.databases[DEFAULT_DB_ALIAS]
+        if source['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Копировать можно только базу SQLite')
+        for alias in settings.DATABASE_REPLICAS:
+            replica = connections.databases[alias]
+            if replica['ENGINE'] != source['ENGINE']:
+                raise CommandError(f'Реплика {alias} — не SQLite')
+            connections[alias].close()
+            copy_database(source['NAME'], replica['NAME'])
+            self.stdout.write(f'{alias}: {replica["NAME"]}')
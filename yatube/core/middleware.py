@@ -0,0 +1,72 @@
+import logging
+
+from django.conf import settings
+
+from . import routers
+from .query_budget import QueryBudgetExceeded, QueryRecorder, check_budget
+from .views import writer_busy
+from .writer import WriterBusy
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetMiddleware:
+    """Следит, чтобы маршруты укладывались в свой бюджет запросов.
+
+    Превышение пишется в лог, а при QUERY_BUDGET_STRICT — ошибка.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryRecorder().record() as recorder:
+            response = self.get_response(request)
+        match = request.resolver_match
+        if match is None:
+            return response
+        report = check_budget(match.view_name, recorder)
+        if report is not None:
+            if settings.QUERY_BUDGET_STRICT:
+                raise QueryBudgetExceeded(report)
+            logger.warning(report)
+        return response
+
+
+class WriterBusyMiddleware:
+    """Отвечает 503 с Retry-After, когда очередь записи переполнена."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, WriterBusy):
+            return writer_busy(request)
+        return None
+
+
+class PrimaryPinMiddleware:
+    """Закрепляет чтение пользователя за основной базой после записи.
+
+    Запрос с записью ставит куку на DATABASE_PIN_SECONDS; пока она жива,
+    чтение идёт мимо реплик, и после редиректа видна своя запись.
+    """
+
+    cookie = 'db_primary'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.pinning(self.cookie in request.COOKIES):
+            response = self.get_response(request)
+            if routers.has_written():
+                response.set_cookie(
+                    self.cookie, '1',
+                    max_age=settings.DATABASE_PIN_SECONDS,
+                    httponly=True, samesite='Lax',
+                )
+        return response
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvalidationLog',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=250, verbose_name='Ключ')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата записи')),
+            ],
+            options={
+                'verbose_name': 'Сброс кэша',
+                'verbose_name_plural': 'Сбросы кэша',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='invalidationlog',
+            index=models.Index(fields=['created'], name='invalidation_created'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import models
+
+
+class InvalidationLog(models.Model):
+    """Журнал сброшенных ключей кэша, общий для всех узлов.
+
+    Только дописывается; процессы читают его с последнего увиденного id
+    и выбрасывают эти ключи из своего L1 (см. core.cache.TieredCache).
+    """
+
+    key = models.CharField('Ключ', max_length=250)
+    created = models.DateTimeField('Дата записи', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Сброс кэша'
+        verbose_name_plural = 'Сбросы кэша'
+        indexes = [
+            models.Index(fields=['created'], name='invalidation_created'),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
+class StoredFile(models.Model):
+    """Файл в хранилище по содержимому и число ссылок на него.
+
+    Одинаковые загрузки хранятся одним файлом; он удаляется, когда
+    уходит последняя ссылка (см. core.storage.ContentAddressedStorage).
+    """
+
+    name = models.CharField('Имя файла', max_length=255, primary_key=True)
+    refs = models.PositiveIntegerField('Число ссылок', default=1)
+    size = models.PositiveIntegerField('Размер, байт')
+
+    class Meta:
+        verbose_name = 'Файл'
+        verbose_name_plural = 'Файлы'
+
+    def __str__(self):
+        return self.name
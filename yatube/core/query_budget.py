@@ -0,0 +1,93 @@
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from functools import lru_cache
+from importlib import import_module
+
+from django.conf import settings
+from django.db import connections
+from django.urls import resolve
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryRecorder:
+    """Записывает запросы к БД: их число, общее время и повторы."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @contextmanager
+    def record(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for sql, duration in self.queries)
+
+    @property
+    def duplicates(self):
+        counter = Counter(sql for sql, duration in self.queries)
+        return {sql: times for sql, times in counter.items() if times > 1}
+
+    def report(self, view_name, budget):
+        lines = [
+            f'{view_name}: {self.count} запросов при бюджете {budget}, '
+            f'{self.total_time * 1000:.1f} мс'
+        ]
+        for sql, times in self.duplicates.items():
+            lines.append(f'  {times}× {sql}')
+        return '\n'.join(lines)
+
+
+@lru_cache(maxsize=None)
+def get_budgets():
+    """Собирает бюджеты query_budgets из модулей QUERY_BUDGET_URLCONFS."""
+    budgets = {}
+    for path in settings.QUERY_BUDGET_URLCONFS:
+        module = import_module(path)
+        namespace = getattr(module, 'app_name', None)
+        for name, budget in module.query_budgets.items():
+            budgets[f'{namespace}:{name}' if namespace else name] = budget
+    return budgets
+
+
+def check_budget(view_name, recorder):
+    """Возвращает отчёт, если маршрут превысил бюджет, иначе None."""
+    budget = get_budgets().get(view_name)
+    if budget is None or recorder.count <= budget:
+        return None
+    return recorder.report(view_name, budget)
+
+
+class QueryBudgetTestMixin:
+    """Проверки бюджета запросов для TestCase."""
+
+    def assertWithinQueryBudget(self, url, client=None):
+        client = client or self.client
+        view_name = resolve(url).view_name
+        self.assertIn(
+            view_name, get_budgets(), f'Для {view_name} не задан бюджет'
+        )
+        with QueryRecorder().record() as recorder:
+            response = client.get(url)
+        report = check_budget(view_name, recorder)
+        if report is not None:
+            self.fail(report)
+        return response
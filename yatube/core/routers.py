@@ -0,0 +1,73 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Чтение закреплено за основной базой: недавняя запись по куке
+_pinned = ContextVar('pinned', default=False)
+# В текущем запросе или потоке уже была запись
+_written = ContextVar('written', default=False)
+
+
+def pin_primary():
+    """Отмечает запись: дальше текущий контекст читает с основной базы."""
+    _written.set(True)
+
+
+def has_written():
+    return _written.get()
+
+
+def reads_primary():
+    return _pinned.get() or _written.get()
+
+
+@contextmanager
+def pinning(pinned):
+    """Своё состояние закрепления на время запроса."""
+    pinned_token = _pinned.set(pinned)
+    written_token = _written.set(False)
+    try:
+        yield
+    finally:
+        _written.reset(written_token)
+        _pinned.reset(pinned_token)
+
+
+class ReplicaRouter:
+    """Читает с реплик из DATABASE_REPLICAS, пишет в основную базу.
+
+    После записи чтение идёт с основной базы, чтобы не увидеть реплику,
+    которая ещё не догнала запись: до конца запроса, а затем
+    DATABASE_PIN_SECONDS по куке (core.middleware.PrimaryPinMiddleware).
+    Закрепляют только записи моделей из DATABASE_PIN_APPS, а модели
+    из DATABASE_PRIMARY_APPS читаются с основной базы всегда.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (
+            not replicas
+            or reads_primary()
+            or model._meta.app_label in settings.DATABASE_PRIMARY_APPS
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in settings.DATABASE_PIN_APPS:
+            pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,45 @@
+import re
+import sqlite3
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+PRAGMAS = (
+    'journal_mode', 'synchronous', 'mmap_size', 'cache_size',
+    'busy_timeout', 'temp_store', 'foreign_keys', 'wal_autocheckpoint',
+)
+VALUE = re.compile(r'^-?\w+$')
+
+
+def pragma_statements(pragmas):
+    """PRAGMA-запросы профиля.
+
+    В PRAGMA нельзя передать параметры, поэтому имена и значения
+    проверяются здесь.
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if name not in PRAGMAS or not VALUE.match(str(value)):
+            raise ImproperlyConfigured(
+                f'Недопустимая настройка SQLite: {name} = {value}'
+            )
+        statements.append(f'PRAGMA {name} = {value}')
+    return statements
+
+
+def copy_database(source, target):
+    """Копирует файл SQLite на ходу через backup API."""
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+
+@receiver(connection_created)
+def apply_pragmas(sender, connection, **kwargs):
+    """Настраивает каждое новое соединение с SQLite по SQLITE_PRAGMAS."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(settings.SQLITE_PRAGMAS):
+            cursor.execute(statement)
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import StoredFile
+
+HASH_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранит файлы под sha256 содержимого: posts/ab/cd/<sha256>.jpg.
+
+    Каталог из upload_to сохраняется, внутри файлы раскладываются по
+    двум уровням подкаталогов, чтобы ни в одном не было миллионов
+    записей. Одинаковые загрузки пишутся один раз; ссылки на файл
+    считаются в core.StoredFile, delete убирает файл с последней.
+    """
+
+    def content_name(self, name, content):
+        sha256 = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        content.seek(0)
+        digest = sha256.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(
+            directory, digest[:2], digest[2:4], digest + extension
+        )
+
+    def is_content_addressed(self, name):
+        return bool(HASH_NAME.search(name))
+
+    def get_available_name(self, name, max_length=None):
+        # Имя загрузки всё равно заменится хэшем в _save. Хэш сюда
+        # попадает при повторе в FileSystemStorage._save, когда такой же
+        # файл пишут параллельно: тогда получится копия с суффиксом, как в
+        # обычном хранилище. Поэтому save нельзя звать с уже хэшированным
+        # именем — передаётся имя в каталоге upload_to
+        if self.is_content_addressed(name):
+            return super().get_available_name(name, max_length)
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        with transaction.atomic():
+            if StoredFile.objects.filter(name=name).update(
+                refs=F('refs') + 1
+            ):
+                self.touch(name)
+                return name
+            if self.exists(name):
+                self.touch(name)
+            else:
+                name = super()._save(name, content)
+            try:
+                with transaction.atomic():
+                    StoredFile.objects.create(name=name, size=content.size)
+            except IntegrityError:
+                # Такой же файл сохранили параллельно
+                StoredFile.objects.filter(name=name).update(
+                    refs=F('refs') + 1
+                )
+        return name
+
+    def touch(self, name):
+        """Освежает mtime повторно загруженного файла.
+
+        Сборщик мусора не трогает свежие файлы, а старый файл, на который
+        вот-вот сошлётся новый пост, иначе выглядел бы давно осиротевшим.
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def purge(self, name):
+        """Удаляет файл независимо от ссылок: на него не ссылается ничто."""
+        StoredFile.objects.filter(name=name).delete()
+        super().delete(name)
+
+    def delete(self, name):
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(
+                name=name
+            ).first()
+            if stored is not None and stored.refs > 1:
+                StoredFile.objects.filter(name=name).update(
+                    refs=F('refs') - 1
+                )
+                return
+            if stored is not None:
+                stored.delete()
+            super().delete(name)
@@ -0,0 +1,207 @@
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from core.cache import SQLiteCache, TieredCache
+from core.models import InvalidationLog
+
+
+def incr_many(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('hits')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_cache(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_basic_operations(self):
+        self.cache.set('post', {'text': 'Тестовый пост'})
+        self.assertEqual(self.cache.get('post'), {'text': 'Тестовый пост'})
+        self.assertFalse(self.cache.add('post', 'другое'))
+        self.assertTrue(self.cache.add('group', 'группа'))
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2}
+        )
+        self.cache.delete_many(['a', 'post'])
+        self.assertIsNone(self.cache.get('post'))
+        self.assertFalse(self.cache.has_key('a'))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get('group'))
+
+    def test_shared_between_instances(self):
+        self.cache.set('page', 'html')
+        self.assertEqual(self.make_cache().get('page'), 'html')
+        self.make_cache().delete('page')
+        self.assertIsNone(self.cache.get('page'))
+
+    def test_expired_entries_are_missing(self):
+        self.cache.set('page', 'html', 0.05)
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('page'))
+        self.assertTrue(self.cache.add('page', 'new'))
+        self.assertFalse(self.cache.touch('missing'))
+
+    def test_incr(self):
+        self.cache.set('hits', 1)
+        self.assertEqual(self.cache.incr('hits', 5), 6)
+        self.assertEqual(self.cache.decr('hits'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('hits', 0)
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=incr_many, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        self.assertEqual(self.cache.get('hits'), 200)
+
+    def test_evicts_least_recently_used(self):
+        cache = self.make_cache(MAX_ENTRIES=3, CULL_FREQUENCY=4)
+        for number in range(3):
+            cache.set(f'key{number}', number)
+        cache._db.execute(
+            "UPDATE cache SET accessed = accessed - 20 + substr(key, -1)"
+        )
+        cache.get('key0')
+        cache.set('key3', 3)
+        self.assertIsNone(cache.get('key1'))
+        self.assertEqual(cache.get_many(['key0', 'key2', 'key3']), {
+            'key0': 0, 'key2': 2, 'key3': 3,
+        })
+
+    def test_overwrites_keep_stats_exact(self):
+        cache = self.make_cache(MAX_ENTRIES=100)
+        for number in range(150):
+            cache.set('key', 'x' * number)
+            cache.set_many({'a': number, 'b': number})
+        for number in range(10):
+            cache.set(f'new{number}', number)
+        stats = cache._db.execute(
+            'SELECT entries, size FROM cache_stats'
+        ).fetchone()
+        actual = cache._db.execute(
+            'SELECT count(*), sum(size) FROM cache'
+        ).fetchone()
+        self.assertEqual(stats, actual)
+        self.assertEqual(actual[0], 13)
+
+    def test_evicts_by_size(self):
+        cache = self.make_cache(MAX_SIZE=10000)
+        for number in range(10):
+            cache.set(f'key{number}', 'x' * 2000)
+        size, = cache._db.execute('SELECT size FROM cache_stats').fetchone()
+        self.assertLessEqual(size, 10000)
+        self.assertIsNotNone(cache.get('key9'))
+
+    def test_benchmark_command(self):
+        out = io.StringIO()
+        call_command(
+            'cache_benchmark', processes=2, keys=10, requests=50,
+            render_time=0, stdout=out,
+        )
+        self.assertIn('sqlite', out.getvalue())
+
+
+class TieredCacheTest(TestCase):
+    """Два экземпляра TieredCache над одним L2 — как два узла."""
+
+    def setUp(self):
+        cache.clear()
+        self.node = self.make_node()
+        self.other_node = self.make_node()
+
+    def make_node(self, **options):
+        options.setdefault('POLL_INTERVAL', 0)
+        return TieredCache('default', {'OPTIONS': options})
+
+    def test_l1_serves_without_l2(self):
+        self.other_node.set('group', 'Тестовая группа')
+        self.node.get('group')
+        with mock.patch.object(cache, 'get') as l2_get:
+            self.assertEqual(self.node.get('group'), 'Тестовая группа')
+        l2_get.assert_not_called()
+
+    def test_write_on_other_node_is_visible_after_poll(self):
+        self.node.set('card', 'старая')
+        self.assertEqual(self.other_node.get('card'), 'старая')
+        self.node.set('card', 'новая')
+        self.assertEqual(self.other_node.get('card'), 'новая')
+        self.node.delete('card')
+        self.assertIsNone(self.other_node.get('card'))
+        # первая запись ключа в журнал не попадает
+        self.assertEqual(InvalidationLog.objects.count(), 2)
+
+    def test_l1_returns_copies(self):
+        self.node.set('page', {'headers': {}})
+        self.node.get('page')['headers']['Set-Cookie'] = 'чужая'
+        self.assertEqual(self.node.get('page'), {'headers': {}})
+
+    def test_locks_are_not_logged(self):
+        self.assertTrue(self.node.add('page:lock', 1))
+        self.assertFalse(self.other_node.add('page:lock', 1))
+        self.node.delete('page:lock')
+        self.assertTrue(self.other_node.add('page:lock', 1))
+        self.assertFalse(InvalidationLog.objects.exists())
+
+    def test_stale_until_poll_interval(self):
+        lazy_node = self.make_node(POLL_INTERVAL=3600)
+        self.node.set('card', 'старая')
+        self.assertEqual(lazy_node.get('card'), 'старая')
+        self.node.set('card', 'новая')
+        self.assertEqual(lazy_node.get('card'), 'старая')
+
+    def test_l1_timeout_bounds_staleness(self):
+        lazy_node = self.make_node(POLL_INTERVAL=3600, L1_TIMEOUT=0)
+        self.node.set('card', 'старая')
+        lazy_node.get('card')
+        self.node.set('card', 'новая')
+        self.assertEqual(lazy_node.get('card'), 'новая')
+
+    def test_clear_flushes_every_node(self):
+        self.other_node.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.node.get_many(['a', 'b']), {'a': 1, 'b': 2})
+        self.other_node.clear()
+        self.assertEqual(self.node.get_many(['a', 'b']), {})
+
+    def test_l1_is_bounded(self):
+        node = self.make_node(L1_MAX_ENTRIES=2)
+        node.set_many({'a': 1, 'b': 2, 'c': 3})
+        self.assertEqual(len(node._l1), 2)
+        self.assertEqual(node.get('a'), 1)
+
+    def test_log_is_pruned(self):
+        node = self.make_node(PRUNE_EVERY=1, LOG_RETENTION=60)
+        node.set('a', 1)
+        node.set('a', 2)
+        InvalidationLog.objects.update(
+            created=timezone.now() - timedelta(hours=1)
+        )
+        node.set('a', 3)
+        self.assertEqual(InvalidationLog.objects.count(), 1)
@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.query_budget import QueryBudgetExceeded, QueryRecorder, get_budgets
+from posts.models import Post
+
+User = get_user_model()
+BUDGET_MIDDLEWARE = 'core.middleware.QueryBudgetMiddleware'
+
+
+class QueryRecorderTest(TestCase):
+    def test_records_count_and_duplicates(self):
+        with QueryRecorder().record() as recorder:
+            for _ in range(3):
+                list(User.objects.filter(username='auth'))
+            User.objects.count()
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual(list(recorder.duplicates.values()), [3])
+        self.assertGreaterEqual(recorder.total_time, 0)
+
+
+@override_settings(MIDDLEWARE=[
+    name for name in settings.MIDDLEWARE if name != BUDGET_MIDDLEWARE
+] + [BUDGET_MIDDLEWARE])
+class QueryBudgetMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.url = reverse('posts:profile', kwargs={'username': 'auth'})
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_budgets_are_read_from_urls(self):
+        self.assertIn('posts:index', get_budgets())
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_exceeded_budget_is_logged(self):
+        with mock.patch.dict(get_budgets(), {'posts:profile': 0}):
+            with self.assertLogs('core.middleware', 'WARNING') as logs:
+                self.guest_client.get(self.url)
+        self.assertIn('posts:profile', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_STRICT=True)
+    def test_exceeded_budget_fails_in_strict_mode(self):
+        with mock.patch.dict(get_budgets(), {'posts:profile': 0}):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.guest_client.get(self.url)
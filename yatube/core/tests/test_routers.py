@@ -0,0 +1,90 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail.models import KVStore
+
+from core.middleware import PrimaryPinMiddleware
+from core.models import InvalidationLog
+from core.routers import ReplicaRouter, pinning
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_go_to_replica_until_write(self):
+        with pinning(False):
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+            self.assertEqual(self.router.db_for_write(Post), 'default')
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        with pinning(False):
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    def test_service_writes_do_not_pin(self):
+        with pinning(False):
+            self.router.db_for_write(InvalidationLog)
+            self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    def test_service_apps_read_primary(self):
+        with pinning(False):
+            for model in (InvalidationLog, KVStore):
+                with self.subTest(model=model):
+                    self.assertEqual(
+                        self.router.db_for_read(model), 'default'
+                    )
+
+    def test_pinned_reads_go_to_primary(self):
+        with pinning(True):
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+        self.assertIsNone(self.router.allow_migrate('default', 'posts'))
+
+
+class PrimaryPinMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_write_sets_pin_cookie(self):
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), {'text': 'Новый пост'}
+        )
+        cookie = response.cookies[PrimaryPinMiddleware.cookie]
+        self.assertEqual(cookie['max-age'], 5)
+
+    def test_read_does_not_set_pin_cookie(self):
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn(PrimaryPinMiddleware.cookie, response.cookies)
+
+    def test_thumbnail_on_read_does_not_set_pin_cookie(self):
+        post = Post.objects.create(author=self.user, text='Тестовый пост')
+        with mock.patch('posts.views.attach_thumbnails') as attach:
+            attach.side_effect = lambda posts: KVStore.objects.create(
+                key='thumbnail-key', value='{}'
+            )
+            response = self.guest_client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk})
+            )
+        self.assertNotIn(PrimaryPinMiddleware.cookie, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=['replica'])
+    def test_pinned_user_reads_primary(self):
+        self.guest_client.cookies[PrimaryPinMiddleware.cookie] = '1'
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.sqlite import pragma_statements
+from posts.counts import estimated_count
+from posts.models import Post
+
+
+class SQLitePragmasTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings_dict = dict(
+            connections['default'].settings_dict,
+            NAME=os.path.join(self.directory, 'db.sqlite3'),
+        )
+        wrapper = type(connections['default'])
+        self.connection = wrapper(settings_dict, 'pragmas')
+
+    def tearDown(self):
+        self.connection.close()
+        shutil.rmtree(self.directory)
+
+    def pragma(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    @override_settings(SQLITE_PRAGMAS={
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'busy_timeout': 1234,
+        'temp_store': 'memory',
+    })
+    def test_profile_applied_to_new_connections(self):
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 1234)
+        self.assertEqual(self.pragma('temp_store'), 2)
+
+    def test_unsafe_values_rejected(self):
+        for pragmas in (
+            {'journal_mode': 'wal; DROP TABLE posts_post'},
+            {'writable_schema': 'on'},
+        ):
+            with self.subTest(pragmas=pragmas):
+                with self.assertRaises(ImproperlyConfigured):
+                    pragma_statements(pragmas)
+
+
+class AnalyzeDbTest(TestCase):
+    def test_statistics_follow_table_size(self):
+        user = get_user_model().objects.create_user(username='auth')
+        for total in (3, 5):
+            Post.objects.bulk_create(
+                Post(author=user, text='Тестовый пост')
+                for _ in range(total - Post.objects.count())
+            )
+            call_command('analyze_db', stdout=StringIO())
+            self.assertEqual(estimated_count(Post), total)
@@ -0,0 +1,58 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from core.models import StoredFile
+from core.storage import ContentAddressedStorage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+
+    def test_name_is_sharded_hash(self):
+        digest = hashlib.sha256(b'image').hexdigest()
+        name = self.storage.save('posts/Photo.JPG', ContentFile(b'image'))
+        self.assertEqual(
+            name, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+        self.assertTrue(self.storage.is_content_addressed(name))
+        self.assertFalse(self.storage.is_content_addressed('posts/a.jpg'))
+
+    def test_identical_uploads_are_stored_once(self):
+        first = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        second = self.storage.save('posts/b.gif', ContentFile(b'same'))
+        other = self.storage.save('posts/c.gif', ContentFile(b'other'))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        self.assertEqual(StoredFile.objects.get(name=first).refs, 2)
+
+    def test_file_deleted_with_last_reference(self):
+        name = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        self.storage.save('posts/b.gif', ContentFile(b'same'))
+        self.storage.delete(name)
+        self.assertTrue(self.storage.exists(name))
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_repeated_upload_refreshes_mtime(self):
+        name = self.storage.save('posts/a.gif', ContentFile(b'same'))
+        old = time.time() - 24 * 60 * 60
+        os.utime(self.storage.path(name), (old, old))
+        self.storage.save('posts/b.gif', ContentFile(b'same'))
+        self.assertGreater(os.path.getmtime(self.storage.path(name)), old)
@@ -0,0 +1,105 @@
+import threading
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+
+from core.writer import STATS, Writer, WriterBusy
+
+User = get_user_model()
+
+
+class WriterTest(TransactionTestCase):
+    def setUp(self):
+        STATS.clear()
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.writer = Writer(queue_size=10, batch_size=10, put_timeout=0)
+
+    def tearDown(self):
+        self.release.set()
+        self.writer.stop()
+
+    def block(self):
+        """Держит поток записи, пока очередь наполняется."""
+        self.started.set()
+        self.release.wait(5)
+
+    def hold(self, writer):
+        writer.submit(self.block)
+        self.started.wait(5)
+
+    def test_queued_writes_committed_in_one_batch(self):
+        self.hold(self.writer)
+        futures = [
+            self.writer.submit(
+                User.objects.create_user, username=f'user{number}'
+            )
+            for number in range(5)
+        ]
+        self.release.set()
+        users = [future.result(5) for future in futures]
+        self.assertEqual(
+            [user.username for user in users],
+            [f'user{number}' for number in range(5)],
+        )
+        self.assertEqual(STATS['batches'], 2)
+        self.assertEqual(STATS['writes'], 6)
+        self.assertEqual(User.objects.count(), 5)
+
+    def test_failed_write_does_not_roll_back_batch(self):
+        self.hold(self.writer)
+        first = self.writer.submit(User.objects.create_user, username='auth')
+        duplicate = self.writer.submit(
+            User.objects.create_user, username='auth'
+        )
+        last = self.writer.submit(User.objects.create_user, username='last')
+        self.release.set()
+        first.result(5)
+        last.result(5)
+        with self.assertRaises(IntegrityError):
+            duplicate.result(5)
+        self.assertEqual(User.objects.count(), 2)
+
+    def test_full_queue_rejects_writes(self):
+        writer = Writer(queue_size=1, batch_size=10, put_timeout=0)
+        try:
+            self.hold(writer)
+            writer.submit(self.block)
+            with self.assertRaises(WriterBusy):
+                writer.submit(self.block)
+            self.assertEqual(STATS['rejected'], 1)
+        finally:
+            self.release.set()
+            writer.stop()
+
+
+class WriterBusyResponseTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @mock.patch('posts.views.write', side_effect=WriterBusy)
+    def test_busy_writer_answers_503(self, write):
+        response = self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}
+        ))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+    @override_settings(DB_WRITER_ENABLED=False)
+    def test_disabled_writer_writes_inline(self):
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}
+        ))
+        self.assertTrue(self.user.follower.filter(author=self.author).exists())
@@ -22,3 +22,10 @@ def server_error(request):
 def permission_denied(request, exception):
     template = 'core/403.html'
     return render(request, template, status=403)
+
+
+def writer_busy(request):
+    template = 'core/503.html'
+    response = render(request, template, status=503)
+    response['Retry-After'] = 5
+    return response
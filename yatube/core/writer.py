@@ -0,0 +1,122 @@
+import logging
+import os
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .routers import pin_primary
+
+logger = logging.getLogger(__name__)
+
+# Счётчики для наблюдения: пачки, записи в них, отказы по переполнению
+STATS = Counter()
+
+_writer = None
+_lock = threading.Lock()
+
+
+class WriterBusy(Exception):
+    """Очередь записи переполнена, запрос стоит повторить позже."""
+
+
+class Writer:
+    """Единственный поток записи в БД.
+
+    SQLite пускает одного писателя за раз, поэтому записи из запросов
+    ставятся в очередь, а поток фиксирует всё накопившееся одной
+    транзакцией (групповая фиксация). Каждая запись идёт в своей точке
+    сохранения: ошибка одной не откатывает остальные.
+    """
+
+    def __init__(self, queue_size, batch_size, put_timeout):
+        self.queue = queue.Queue(queue_size)
+        self.batch_size = batch_size
+        self.put_timeout = put_timeout
+        self.pid = os.getpid()
+        self.thread = threading.Thread(
+            target=self.run, name='db-writer', daemon=True
+        )
+        self.thread.start()
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        try:
+            self.queue.put(
+                (future, func, args, kwargs), timeout=self.put_timeout
+            )
+        except queue.Full:
+            STATS['rejected'] += 1
+            raise WriterBusy
+        return future
+
+    def stop(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        pin_primary()
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while batch[-1] is not None and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+            if batch:
+                self.commit(batch)
+        connection.close()
+
+    def commit(self, batch):
+        close_old_connections()
+        results = []
+        try:
+            with transaction.atomic():
+                for future, func, args, kwargs in batch:
+                    try:
+                        with transaction.atomic():
+                            results.append((future, func(*args, **kwargs)))
+                    except Exception as error:
+                        results.append((future, error))
+        except Exception as error:
+            logger.exception('Не удалось зафиксировать пачку записей')
+            results = [(future, error) for future, *job in batch]
+        STATS['batches'] += 1
+        STATS['writes'] += len(batch)
+        for future, result in results:
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+def get_writer():
+    """Поток записи текущего процесса; после fork создаётся заново."""
+    global _writer
+    with _lock:
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = Writer(
+                settings.DB_WRITER_QUEUE_SIZE,
+                settings.DB_WRITER_BATCH_SIZE,
+                settings.DB_WRITER_PUT_TIMEOUT,
+            )
+        return _writer
+
+
+def write(func, *args, **kwargs):
+    """Выполняет запись и возвращает её результат.
+
+    При DB_WRITER_ENABLED запись уходит в поток записи, а запрос ждёт
+    её фиксации; иначе выполняется сразу.
+    """
+    if not settings.DB_WRITER_ENABLED:
+        return func(*args, **kwargs)
+    pin_primary()
+    return get_writer().submit(func, *args, **kwargs).result()
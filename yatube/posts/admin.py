@@ -1,9 +1,75 @@
+import datetime as dt
+
 from django.contrib import admin
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Post, Group, Follow, Comment
+from .paginators import EstimatedCountPaginator
+from .search import match_expression, matching_ids
+
+
+class PubMonthFilter(admin.SimpleListFilter):
+    """Фильтр по году и месяцу публикации.
+
+    Годы берутся из MIN и MAX по индексу, а выбор — диапазон pub_date,
+    так что ни список, ни фильтр не просматривают таблицу.
+    """
+
+    title = 'месяц публикации'
+    parameter_name = 'pub_month'
+
+    def lookups(self, request, model_admin):
+        # по отдельности: MIN и MAX в одном запросе SQLite считает обходом
+        posts = model_admin.model.objects
+        first = posts.aggregate(value=Min('pub_date'))['value']
+        if first is None:
+            return []
+        last = posts.aggregate(value=Max('pub_date'))['value']
+        first = timezone.localtime(first)
+        last = timezone.localtime(last)
+        choices = []
+        for year in range(last.year, first.year - 1, -1):
+            choices.append((str(year), str(year)))
+            if self.value() and self.value()[:4] == str(year):
+                months = range(1, 13)
+                if year == first.year:
+                    months = range(first.month, 13)
+                if year == last.year:
+                    months = [m for m in months if m <= last.month]
+                for month in reversed(list(months)):
+                    choices.append(
+                        (f'{year}-{month:02}', f'— {month:02}.{year}')
+                    )
+        return choices
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        try:
+            year, _, month = value.partition('-')
+            start = dt.datetime(int(year), int(month or 1), 1)
+        except ValueError:
+            return queryset.none()
+        if month:
+            end = (start + dt.timedelta(days=32)).replace(day=1)
+        else:
+            end = start.replace(year=start.year + 1)
+        return queryset.filter(
+            pub_date__gte=timezone.make_aware(start),
+            pub_date__lt=timezone.make_aware(end),
+        )
+
 
-from .models import Post, Group, Follow
+class ScalableAdmin(admin.ModelAdmin):
+    """Список без точного подсчёта строк: оценка и ограниченный COUNT."""
 
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
-class PostAdmin(admin.ModelAdmin):
+
+class PostAdmin(ScalableAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,11 +78,41 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
-    list_filter = ('pub_date',)
+    list_filter = ('pub_date', PubMonthFilter)
+    autocomplete_fields = ('author', 'group')
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по полнотекстовому индексу, а не LIKE по всей таблице."""
+        match = match_expression(search_term)
+        if match is None:
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(match)), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug', 'posts_count')
+    search_fields = ('title', 'slug')
+
+
+class CommentAdmin(ScalableAdmin):
+    list_display = ('pk', 'text', 'created', 'author', 'post')
+    list_select_related = ('author', 'post')
+    autocomplete_fields = ('author', 'post')
+    # по первичному ключу, а не по created: для этого нет индекса
+    ordering = ('-pk',)
+
+
+class FollowAdmin(ScalableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    ordering = ('-pk',)
+
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Follow)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
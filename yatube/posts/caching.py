@@ -0,0 +1,210 @@
+import hashlib
+import math
+import random
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATE = 'includes/article.html'
+CARD_KEY = 'posts:card:{}:{}'
+PAGE_KEY = 'posts:page:{}'
+TAG_KEY = 'posts:page-tag:{}'
+LOCK_KEY = '{}:lock'
+
+# Счётчики процесса: hit, miss, early (досрочный пересчёт),
+# stale (отдано устаревшее) и lock_wait (ждали чужой пересчёт)
+STATS = Counter()
+
+_skip_page = ContextVar('skip_page', default=False)
+
+
+def _lock(key):
+    return cache.add(
+        LOCK_KEY.format(key), 1, settings.POSTS_CACHE_LOCK_TIMEOUT
+    )
+
+
+def _unlock(key):
+    cache.delete(LOCK_KEY.format(key))
+
+
+def _expires_early(expires, delta):
+    """Вероятностный досрочный пересчёт (XFetch).
+
+    Чем ближе срок и чем дороже вычисление, тем вероятнее, что
+    очередной запрос пересчитает значение заранее, пока остальные
+    ещё получают старое.
+    """
+    if expires is None:
+        return False
+    jitter = -delta * settings.POSTS_CACHE_EARLY_BETA * math.log(
+        1 - random.random()
+    )
+    return time.time() + jitter >= expires
+
+
+def cached(key, compute, timeout, is_fresh=None, cacheable=None):
+    """Значение из кэша с защитой от одновременного пересчёта.
+
+    Пересчитывает только тот, кто взял блокировку; остальные получают
+    устаревшее значение, а если его нет — ждут результат до
+    POSTS_CACHE_LOCK_WAIT секунд. Запись живёт в кэше ещё
+    POSTS_CACHE_STALE_TIMEOUT после своего срока, чтобы было что отдать.
+    is_fresh проверяет значение (например, версии меток), cacheable
+    решает, стоит ли его сохранять.
+    """
+    entry = cache.get(key)
+    if entry is not None:
+        value, expires, delta = entry
+        fresh = is_fresh is None or is_fresh(value)
+        if fresh and not _expires_early(expires, delta):
+            STATS['hit'] += 1
+            return value
+        if not _lock(key):
+            STATS['stale'] += 1
+            return value
+        STATS['early' if fresh else 'miss'] += 1
+    elif _lock(key):
+        STATS['miss'] += 1
+    else:
+        STATS['lock_wait'] += 1
+        deadline = time.monotonic() + settings.POSTS_CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+        return compute()
+    try:
+        start = time.monotonic()
+        value = compute()
+        delta = time.monotonic() - start
+        if cacheable is None or cacheable(value):
+            expires = None if timeout is None else time.time() + timeout
+            if timeout is not None:
+                timeout += settings.POSTS_CACHE_STALE_TIMEOUT
+            cache.set(key, (value, expires, delta), timeout)
+    finally:
+        _unlock(key)
+    return value
+
+
+def card_version(post, group=None):
+    """Версия карточки поста.
+
+    Складывается из всех данных, которые попадают в карточку, поэтому
+    меняется при правке поста, смене имени автора или группы.
+    """
+    parts = (
+        post.text,
+        post.image.name,
+        post.pub_date.isoformat(),
+        post.comments_count,
+        post.author.username,
+        post.author.get_full_name(),
+        post.group.slug if post.group_id else '',
+        getattr(post, 'thumbnail_url', None),
+        sorted(getattr(post, 'thumbnail_srcset', {}).items()),
+        group is None,
+    )
+    raw = '\x1f'.join(str(part) for part in parts)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def render_cards(posts, group=None):
+    """Проставляет постам готовые карточки post.card.
+
+    Все карточки страницы достаются из кэша одним get_many,
+    шаблон рендерится только для промахов.
+    """
+    keys = {
+        post.pk: CARD_KEY.format(post.pk, card_version(post, group))
+        for post in posts
+    }
+    cached = cache.get_many(keys.values())
+    missing = {}
+    for post in posts:
+        key = keys[post.pk]
+        card = cached.get(key)
+        if card is None:
+            card = render_to_string(
+                CARD_TEMPLATE, {'post': post, 'group': group}
+            )
+            missing[key] = card
+        post.card = mark_safe(card)
+    if missing:
+        cache.set_many(missing, settings.POSTS_CARD_CACHE_TIMEOUT)
+    return posts
+
+
+def tag_versions(tags):
+    keys = [TAG_KEY.format(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def purge_pages(tags):
+    """Сбрасывает все закэшированные страницы с этими метками."""
+    cache.set_many(
+        {TAG_KEY.format(tag): uuid.uuid4().hex for tag in tags}, None
+    )
+
+
+def skip_page_cache():
+    """Не кэшировать страницу, которая сейчас рендерится."""
+    _skip_page.set(True)
+
+
+def tag_response(response, *tags):
+    """Помечает ответ метками данных, из которых он собран."""
+    response.cache_tags = tags
+    return response
+
+
+def cache_anonymous_page(view):
+    """Кэширует страницу целиком для анонимных посетителей.
+
+    Ключ — путь с query string. Вместе с ответом хранятся версии его
+    меток (см. tag_response), и после purge_pages любой из них
+    страница считается устаревшей: её пересчитывает один запрос,
+    остальные пока получают прежнюю (см. cached).
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+
+        def render():
+            token = _skip_page.set(False)
+            try:
+                response = view(request, *args, **kwargs)
+                skip = _skip_page.get()
+            finally:
+                _skip_page.reset(token)
+            tags = None if skip else getattr(response, 'cache_tags', None)
+            versions = tag_versions(tags) if tags else None
+            return tags, versions, response
+
+        tags, versions, response = cached(
+            PAGE_KEY.format(path),
+            render,
+            settings.POSTS_PAGE_CACHE_TIMEOUT,
+            is_fresh=lambda page: tag_versions(page[0]) == page[1],
+            cacheable=lambda page: (
+                page[2].status_code == 200 and page[0] is not None
+            ),
+        )
+        return response
+    return wrapper
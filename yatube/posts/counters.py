@@ -0,0 +1,68 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def bump(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def bump_user(user_id, field, delta):
+    """Атомарно сдвигает счётчик пользователя, создавая строку при нужде."""
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        bump(stats, field, delta)
+        return
+    if not stats.update(**{field: F(field) + delta}):
+        UserStats.objects.get_or_create(user_id=user_id)
+        bump_user(user_id, field, delta)
+
+
+def count_of(model, field):
+    """Подзапрос: число строк model, ссылающихся на внешнюю строку."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(total=Count('pk'))
+            .values('total')
+        ),
+        Value(0),
+    )
+
+
+# Какие счётчики каких моделей чем пересчитывать
+RECONCILERS = (
+    (Group, {'posts_count': count_of(Post, 'group')}),
+    (Post, {'comments_count': count_of(Comment, 'post')}),
+    (UserStats, {
+        'posts_count': count_of(Post, 'author'),
+        'followers_count': count_of(Follow, 'author'),
+        'following_count': count_of(Follow, 'user'),
+    }),
+)
+
+
+def create_missing_stats():
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing], ignore_conflicts=True
+    )
+
+
+def reconcile(model, counters, start, stop):
+    """Исправляет расхождения счётчиков в диапазоне первичных ключей.
+
+    Возвращает число исправленных строк.
+    """
+    rows = model.objects.filter(pk__gte=start, pk__lt=stop)
+    fixed = 0
+    for field, expression in counters.items():
+        fixed += rows.annotate(actual=expression).exclude(
+            **{field: F('actual')}
+        ).update(**{field: expression})
+    return fixed
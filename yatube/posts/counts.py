@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+from .caching import cached
+
+COUNT_KEY = 'posts:count:{}'
+
+
+def index_feed():
+    return 'index'
+
+
+def group_feed(group_id):
+    return f'group:{group_id}'
+
+
+def author_feed(author_id):
+    return f'author:{author_id}'
+
+
+def follow_feed(user_id):
+    return f'follow:{user_id}'
+
+
+def estimated_count(model, using='default'):
+    """Оценка числа строк таблицы по статистике СУБД без COUNT(*).
+
+    Возвращает None, если статистики нет или СУБД не поддерживается.
+    Статистику собирает и обновляет команда analyze_db.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'sqlite':
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            rows = cursor.fetchall()
+    except DatabaseError:
+        return None
+    estimates = [int(str(stat).split()[0]) for stat, in rows]
+    return max(estimates) if estimates else None
+
+
+def count_posts(queryset):
+    query = getattr(queryset, 'query', None)
+    if query is not None and not query.where:
+        estimate = estimated_count(queryset.model, queryset.db)
+        if (estimate is not None
+                and estimate >= settings.POSTS_ESTIMATED_COUNT_MIN):
+            return estimate
+    return queryset.count()
+
+
+def feed_count(feed, queryset):
+    """Число постов ленты из кэша; при промахе считается один раз."""
+    return cached(
+        COUNT_KEY.format(feed),
+        lambda: count_posts(queryset),
+        settings.POSTS_COUNT_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_counts(feeds):
+    cache.delete_many([COUNT_KEY.format(feed) for feed in feeds])
@@ -0,0 +1,42 @@
+"""Обработка картинок без Django: модуль запускается в дочерних процессах."""
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# Форматы, которые перекодируются; остальные (например, GIF) и
+# анимированные PNG и WebP хранятся как есть
+FORMATS = ('JPEG', 'PNG', 'WEBP')
+
+
+def normalize_image(data, max_size, quality):
+    """Готовит загруженную картинку к хранению.
+
+    Поворачивает по EXIF, уменьшает до max_size по большей стороне,
+    убирает метаданные и перекодирует. Возвращает новые байты или None,
+    если картинку менять не нужно.
+    """
+    with Image.open(BytesIO(data)) as image:
+        image_format = image.format
+        # перекодирование сохранило бы только первый кадр анимации
+        if image_format not in FORMATS or getattr(
+            image, 'is_animated', False
+        ):
+            return None
+        has_metadata = bool(image.info.get('exif') or image.getexif())
+        # JPEG сразу декодируется в уменьшенном масштабе
+        image.draft('RGB', (max_size, max_size))
+        normalized = ImageOps.exif_transpose(image)
+        size = normalized.size
+        normalized.thumbnail((max_size, max_size), Image.LANCZOS)
+        changed = has_metadata or normalized.size != size
+        out = BytesIO()
+        if image_format == 'JPEG':
+            normalized.convert('RGB').save(
+                out, 'JPEG', quality=quality, optimize=True, progressive=True
+            )
+        else:
+            normalized.save(out, image_format, optimize=True)
+    result = out.getvalue()
+    if not changed and len(result) >= len(data):
+        return None
+    return result
@@ -0,0 +1,99 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from core.models import StoredFile
+from posts import media
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов, на которые никто не ссылается, '
+        'и их миниатюры'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Пауза между пачками в секундах',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=60 * 60,
+            help='Не трогать файлы моложе стольких секунд',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать, что будет удалено',
+        )
+
+    def handle(self, *args, batch_size, sleep, min_age, dry_run,
+               **options):
+        self.sleep = sleep
+        self.dry_run = dry_run
+        self.report('Оригиналы', self.collect_originals(batch_size, min_age))
+        self.report('Миниатюры удалённых оригиналов', self.collect_sources(
+            batch_size
+        ))
+        self.report('Миниатюры без записи в sorl', self.collect_thumbnails(
+            batch_size, min_age
+        ))
+
+    def report(self, title, result):
+        files, size = result
+        verb = 'будет освобождено' if self.dry_run else 'освобождено'
+        self.stdout.write(
+            f'{title}: файлов {files}, {verb} {size / 1024 / 1024:.1f} МБ'
+        )
+
+    def pause(self):
+        if self.sleep:
+            time.sleep(self.sleep)
+
+    def collect_originals(self, batch_size, min_age):
+        files = size = 0
+        for orphans, refs in media.orphaned_originals(batch_size, min_age):
+            for name in orphans:
+                name_size = media.file_size(default_storage, name)
+                if not self.dry_run and not media.purge_orphan(
+                    default_storage, name, min_age
+                ):
+                    continue
+                files += 1
+                size += name_size
+            if not self.dry_run:
+                # Заодно чиним счётчики ссылок, сбитые заменой картинок
+                for name, count in refs.items():
+                    StoredFile.objects.filter(name=name).exclude(
+                        refs=count
+                    ).update(refs=count)
+            self.pause()
+        return files, size
+
+    def collect_sources(self, batch_size):
+        files = size = 0
+        for sources in media.thumbnail_sources(batch_size):
+            refs = media.references([source.name for source in sources])
+            for source in sources:
+                if source.name in refs:
+                    continue
+                for thumbnail in media.thumbnails_of(source):
+                    files += 1
+                    size += media.file_size(default.storage, thumbnail.name)
+                if not self.dry_run:
+                    default.kvstore.delete(source)
+            self.pause()
+        return files, size
+
+    def collect_thumbnails(self, batch_size, min_age):
+        files = size = 0
+        for orphans in media.unregistered_thumbnails(batch_size, min_age):
+            for name in orphans:
+                files += 1
+                size += media.file_size(default.storage, name)
+                if not self.dry_run:
+                    default.storage.delete(name)
+            self.pause()
+        return files, size
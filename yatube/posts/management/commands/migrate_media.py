@@ -0,0 +1,62 @@
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Переносит картинки постов в хранилище по содержимому пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Пауза между пачками в секундах',
+        )
+        parser.add_argument(
+            '--start-after', type=int, default=0,
+            help='Продолжить после поста с этим id',
+        )
+
+    def handle(self, *args, batch_size, sleep, start_after, **options):
+        storage = default_storage
+        if not hasattr(storage, 'is_content_addressed'):
+            raise CommandError(
+                'DEFAULT_FILE_STORAGE не хранит файлы по содержимому'
+            )
+        last_pk = start_after
+        moved = missing = 0
+        while True:
+            batch = list(Post.objects.filter(
+                pk__gt=last_pk
+            ).exclude(image='').order_by('pk').values_list(
+                'pk', 'image'
+            )[:batch_size])
+            if not batch:
+                break
+            for pk, name in batch:
+                if storage.is_content_addressed(name):
+                    continue
+                if not storage.exists(name):
+                    missing += 1
+                    continue
+                with storage.open(name) as image:
+                    new_name = storage.save(name, image)
+                if not Post.objects.filter(pk=pk, image=name).update(
+                    image=new_name
+                ):
+                    # Картинку поменяли во время переноса
+                    storage.delete(new_name)
+                    continue
+                if not Post.objects.filter(image=name).exists():
+                    storage.delete(name)
+                moved += 1
+            last_pk = batch[-1][0]
+            self.stdout.write(f'Обработаны посты до id {last_pk}')
+            if sleep:
+                time.sleep(sleep)
+        self.stdout.write(
+            f'Перенесено картинок: {moved}, не найдено файлов: {missing}'
+        )
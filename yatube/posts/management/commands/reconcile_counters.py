@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from posts.counters import RECONCILERS, create_missing_stats, reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--sleep', type=float, default=0,
+            help='Пауза между пачками в секундах',
+        )
+
+    def handle(self, *args, batch_size, sleep, **options):
+        create_missing_stats()
+        for model, counters in RECONCILERS:
+            last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            fixed = 0
+            for start in range(0, last_pk + 1, batch_size):
+                with transaction.atomic():
+                    fixed += reconcile(
+                        model, counters, start, start + batch_size
+                    )
+                if sleep:
+                    time.sleep(sleep)
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: исправлено {fixed}'
+            )
@@ -0,0 +1,141 @@
+import os
+from datetime import timedelta
+from itertools import islice
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix, del_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from core.models import StoredFile
+
+from .models import Post
+from .thumbnails import kvstore_get_many
+
+
+def walk(storage, path):
+    """Файлы каталога хранилища по одному, без списка всего дерева."""
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield os.path.join(path, name)
+    for directory in directories:
+        yield from walk(storage, os.path.join(path, directory))
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def settled(storage, names, min_age):
+    """Файлы старше min_age: свежие могут ещё ждать коммита поста."""
+    cutoff = timezone.now() - timedelta(seconds=min_age)
+    return [
+        name for name in names
+        if storage.get_modified_time(name) < cutoff
+    ]
+
+
+def references(names):
+    """Сколько постов ссылается на каждое из имён."""
+    # order_by() убирает pub_date из Meta.ordering, иначе он попадёт
+    # в GROUP BY и посты с одним файлом посчитаются по отдельности
+    counts = Post.objects.filter(image__in=names).order_by().values(
+        'image'
+    ).annotate(refs=Count('pk'))
+    return {row['image']: row['refs'] for row in counts}
+
+
+def orphaned_originals(batch_size, min_age):
+    """Пачки (имена, ссылки) оригиналов; без ссылок — осиротевшие."""
+    upload_to = Post._meta.get_field('image').upload_to
+    files = walk(default_storage, upload_to)
+    for batch in batches(files, batch_size):
+        batch = settled(default_storage, batch, min_age)
+        refs = references(batch)
+        yield [name for name in batch if name not in refs], refs
+
+
+def purge_orphan(storage, name, min_age):
+    """Удаляет осиротевший оригинал, если он так и остался без ссылок.
+
+    Между выборкой пачки и удалением мог прийти пост с тем же файлом,
+    поэтому всё перепроверяется в одной транзакции. Запись StoredFile
+    удаляется первой: параллельная загрузка того же файла ждёт коммита,
+    а если успела раньше — обновила mtime, и файл уже не settled.
+    """
+    purge = getattr(storage, 'purge', storage.delete)
+    with transaction.atomic():
+        StoredFile.objects.filter(name=name).delete()
+        if (
+            Post.objects.filter(image=name).exists()
+            or not storage.exists(name)
+            or not settled(storage, [name], min_age)
+        ):
+            transaction.set_rollback(True)
+            return False
+        purge(name)
+    return True
+
+
+def thumbnail_sources(batch_size):
+    """Пачки исходников, для которых sorl хранит список миниатюр.
+
+    Идёт по ключам по порядку, а не курсором: записи пачки могут
+    удалить до того, как будет прочитана следующая.
+    """
+    prefix = add_prefix('', identity='thumbnails')
+    last_key = ''
+    while True:
+        batch = list(KVStoreModel.objects.filter(
+            key__startswith=prefix, key__gt=last_key
+        ).order_by('key').values_list('key', flat=True)[:batch_size])
+        if not batch:
+            return
+        last_key = batch[-1]
+        values = kvstore_get_many([
+            add_prefix(del_prefix(key)) for key in batch
+        ])
+        yield [
+            deserialize_image_file(value)
+            for value in values.values() if value
+        ]
+
+
+def thumbnails_of(source):
+    keys = default.kvstore._get(source.key, identity='thumbnails') or []
+    values = kvstore_get_many([add_prefix(key) for key in keys])
+    return [
+        deserialize_image_file(value) for value in values.values() if value
+    ]
+
+
+def unregistered_thumbnails(batch_size, min_age):
+    """Пачки файлов миниатюр, о которых не знает хранилище sorl."""
+    storage = default.storage
+    files = walk(storage, sorl_settings.THUMBNAIL_PREFIX)
+    for batch in batches(files, batch_size):
+        batch = settled(storage, batch, min_age)
+        keys = {
+            name: add_prefix(ImageFile(name, storage).key) for name in batch
+        }
+        values = kvstore_get_many(list(keys.values()))
+        yield [name for name, key in keys.items() if not values.get(key)]
+
+
+def file_size(storage, name):
+    try:
+        return storage.size(name)
+    except OSError:
+        return 0
@@ -4,7 +4,29 @@ from django.db import models
 User = get_user_model()
 
 
-class Group(models.Model):
+class CountersModel(models.Model):
+    """Модель с денормализованными счётчиками.
+
+    Счётчики меняются только через F()-обновления, поэтому обычное
+    сохранение загруженного объекта их не перезаписывает.
+    """
+
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+
+class Group(CountersModel):
     title = models.CharField(
         'Название группы',
         help_text='Введите название группы',
@@ -18,6 +40,9 @@ class Group(models.Model):
     description = models.TextField(
         'Описание группы',
         help_text='Напишите о чем группа')
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+
+    counter_fields = ('posts_count',)
 
     def __str__(self):
         return self.title
@@ -27,7 +52,7 @@ class Group(models.Model):
         verbose_name_plural = 'Группы'
 
 
-class Post(models.Model):
+class Post(CountersModel):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -41,11 +66,13 @@ class Post(models.Model):
         on_delete=models.CASCADE,
         related_name='posts',
         verbose_name='Автор',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
         blank=True,
         null=True,
+        db_index=False,
         related_name='posts',
         on_delete=models.SET_NULL,
         verbose_name='Группа',
@@ -56,12 +83,31 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+    )
+
+    counter_fields = ('comments_count',)
 
     def __str__(self):
         return self.text[:15]
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_pub_date'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date',
+            ),
+            # поиск постов по файлу: сборка мусора и перенос картинок
+            models.Index(fields=['image'], name='post_image'),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -72,6 +118,7 @@ class Comment(models.Model):
         verbose_name='Пост',
         related_name='comments',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -88,6 +135,15 @@ class Comment(models.Model):
         auto_now_add=True,
     )
 
+    class Meta:
+        ordering = ['created']
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created',
+            ),
+        ]
+
     def __str__(self):
         return self.text[:15]
 
@@ -104,9 +160,16 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name='following',
         verbose_name='Автор',
+        db_index=False,
     )
 
     class Meta:
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author_user',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
@@ -115,3 +178,56 @@ class Follow(models.Model):
         ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date',
+            )
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='timeline_user_post',
+            )
+        ]
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
@@ -0,0 +1,214 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+from .counts import count_posts, feed_count
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def pack_cursor(*parts):
+    """Упаковывает части позиции в непрозрачный токен для URL."""
+    raw = '|'.join(str(part) for part in parts)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def unpack_cursor(cursor):
+    """Части позиции из токена; для испорченного токена возвращает None."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def encode_cursor(direction, pub_date, pk):
+    """Упаковывает позицию (pub_date, id) в непрозрачный токен."""
+    return pack_cursor(direction, pub_date.isoformat(), pk)
+
+
+def decode_cursor(cursor):
+    """Распаковывает токен; для испорченного токена возвращает None."""
+    parts = unpack_cursor(cursor)
+    try:
+        direction, pub_date, pk = parts
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class WindowedPaginator(Paginator):
+    """Пагинатор с укороченным списком номеров страниц.
+
+    Вместо всех страниц показывает первые и последние страницы
+    и окно вокруг текущей, так что размер навигации не растёт
+    вместе с числом постов.
+    """
+
+    ELLIPSIS = '…'
+    on_each_side = 3
+    on_ends = 1
+
+    def __init__(self, object_list, per_page, feed=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.feed = feed
+
+    @cached_property
+    def count(self):
+        if self.feed is None:
+            return super().count
+        return feed_count(self.feed, self.object_list)
+
+    def page(self, number):
+        page = super().page(number)
+        page.page_window = list(self.get_elided_page_range(page.number))
+        return page
+
+    def get_elided_page_range(self, number=1):
+        number = self.validate_number(number)
+        on_each_side, on_ends = self.on_each_side, self.on_ends
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки без точного COUNT(*) по большим таблицам.
+
+    Для всей таблицы число строк берётся из статистики СУБД, а
+    отфильтрованные строки считаются не дальше POSTS_ADMIN_COUNT_LIMIT.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return count_posts(queryset)
+        limit = settings.POSTS_ADMIN_COUNT_LIMIT
+        return queryset.order_by().values('pk')[:limit].count()
+
+
+class CursorPage(Page):
+    """Страница ленты без номера: навигация только вперёд и назад."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.next_cursor = None
+        self.previous_cursor = None
+        if has_next:
+            self.next_cursor = encode_cursor(
+                NEXT, *paginator.position(object_list[-1])
+            )
+        if has_previous:
+            self.previous_cursor = encode_cursor(
+                PREVIOUS, *paginator.position(object_list[0])
+            )
+
+    def __repr__(self):
+        return '<Cursor page>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def start_index(self):
+        """Курсорная страница не знает своего места в ленте."""
+        return None
+
+    def end_index(self):
+        return None
+
+
+class CursorPaginator:
+    """Пагинация по ключу (pub_date, id) без OFFSET и COUNT(*).
+
+    Каждая страница — один диапазонный запрос по индексу,
+    сколько бы страниц ни было до неё. key — поля ключа, если лента
+    сортируется не по самим постам (например, по записям ленты подписок).
+    """
+
+    key = ('pub_date', 'pk')
+
+    def __init__(self, object_list, per_page, feed=None, key=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.feed = feed
+        if key is not None:
+            self.key = key
+
+    @cached_property
+    def count(self):
+        """Общее число постов считается, только если его запросили."""
+        if self.feed is None:
+            return self.object_list.count()
+        return feed_count(self.feed, self.object_list)
+
+    def position(self, post):
+        date_field, pk_field = self.key
+        return getattr(post, date_field), getattr(post, pk_field)
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor) if cursor else None
+        if position is None:
+            return self._page_after(None, has_previous=False)
+        direction, pub_date, pk = position
+        if direction == NEXT:
+            return self._page_after((pub_date, pk), has_previous=True)
+        return self._page_before((pub_date, pk))
+
+    def _page_after(self, position, has_previous):
+        date_field, pk_field = self.key
+        queryset = self.object_list.order_by(f'-{date_field}', f'-{pk_field}')
+        if position is not None:
+            pub_date, pk = position
+            # без OR: так SQLite ищет по индексу, а не перебирает
+            # все более новые посты
+            queryset = queryset.filter(**{
+                f'{date_field}__lte': pub_date,
+            }).exclude(**{date_field: pub_date, f'{pk_field}__gte': pk})
+        posts = list(queryset[:self.per_page + 1])
+        has_next = len(posts) > self.per_page
+        return CursorPage(
+            posts[:self.per_page], self, has_next, has_previous
+        )
+
+    def _page_before(self, position):
+        date_field, pk_field = self.key
+        pub_date, pk = position
+        queryset = self.object_list.order_by(date_field, pk_field).filter(**{
+            f'{date_field}__gte': pub_date,
+        }).exclude(**{date_field: pub_date, f'{pk_field}__lte': pk})
+        posts = list(queryset[:self.per_page + 1])
+        has_previous = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+        posts.reverse()
+        if not posts:
+            return self._page_after(None, has_previous=False)
+        return CursorPage(posts, self, True, has_previous)
@@ -0,0 +1,117 @@
+import re
+
+from django.db import connections, router
+from django.db.models.expressions import RawSQL
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginators import pack_cursor, unpack_cursor
+
+TERM = re.compile(r'\w+')
+MAX_TERMS = 10
+# Границы совпадений в сниппете; в тексте постов таких символов нет
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 16
+
+MATCH_SQL = 'SELECT rowid FROM posts_post_fts WHERE posts_post_fts MATCH %s'
+SEARCH_SQL = """
+    SELECT id, score, snippet FROM (
+        SELECT rowid AS id, bm25(posts_post_fts) AS score,
+               snippet(posts_post_fts, 0, %s, %s, '…', %s) AS snippet
+        FROM posts_post_fts WHERE posts_post_fts MATCH %s
+    )
+    {where}
+    ORDER BY score, id
+    LIMIT %s
+"""
+AFTER = 'WHERE score > %s OR (score = %s AND id > %s)'
+
+
+def match_expression(query):
+    """Запрос FTS5 из пользовательской строки: все слова, каждое в кавычках.
+
+    Операторы FTS5 из строки не проходят, так что ошибка синтаксиса
+    невозможна. Для строки без слов возвращает None.
+    """
+    terms = TERM.findall(query)[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' '.join(f'"{term}"' for term in terms)
+
+
+def matching_ids(match):
+    """Подзапрос с id постов, подходящих под запрос, — для filter(pk__in)."""
+    return RawSQL(MATCH_SQL, [match])
+
+
+def decode_cursor(cursor):
+    try:
+        score, pk = unpack_cursor(cursor)
+        return float(score), int(pk)
+    except (TypeError, ValueError):
+        return None
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchPage:
+    """Страница результатов поиска; дальше — только по курсору."""
+
+    def __init__(self, posts, next_cursor):
+        self.object_list = posts
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def search(query, cursor=None, per_page=10):
+    """Посты по релевантности (bm25) со сниппетами совпадений.
+
+    Страницы идут по ключу (score, id) без OFFSET. Посты подгружаются
+    одним запросом, в post.snippet — фрагмент текста с <mark>.
+    """
+    match = match_expression(query)
+    if match is None:
+        return SearchPage([], None)
+    params = [MARK_START, MARK_END, SNIPPET_TOKENS, match]
+    where = ''
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        score, pk = position
+        where = AFTER
+        params += [score, score, pk]
+    params.append(per_page + 1)
+    connection = connections[router.db_for_read(Post)]
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(SEARCH_SQL.format(where=where), params)
+        rows = db_cursor.fetchall()
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        pk, score, snippet = rows[-1]
+        next_cursor = pack_cursor(repr(score), pk)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [row[0] for row in rows]
+    )
+    results = []
+    for pk, score, snippet in rows:
+        post = posts.get(pk)
+        if post is not None:
+            post.snippet = highlight(snippet)
+            results.append(post)
+    return SearchPage(results, next_cursor)
@@ -0,0 +1,191 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import counts, timeline
+from .caching import purge_pages
+from .counters import bump, bump_user
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    instance._initial_group_id = instance.__dict__.get('group_id')
+    image = instance.__dict__.get('image')
+    instance._initial_image = getattr(image, 'name', image)
+
+
+def release_image(image, name):
+    """Снимает ссылку поста на файл, когда транзакция зафиксирована.
+
+    Хранилище по содержимому удаляет файл вместе с последней ссылкой;
+    до COMMIT откат вернул бы пост к файлу, которого уже нет. Ссылки
+    считаются только у файлов этого хранилища, прочие не трогаются.
+    """
+    storage = image.storage
+    is_content_addressed = getattr(storage, 'is_content_addressed', None)
+    if name and is_content_addressed and is_content_addressed(name):
+        transaction.on_commit(lambda: storage.delete(name))
+
+
+def after_commit(func, *args):
+    """Выполняет сброс сейчас и, внутри транзакции, ещё раз после COMMIT.
+
+    Одного сброса до COMMIT мало: параллельный запрос прочитает ещё
+    старые данные и закэширует их под новой версией метки. Повторный
+    сброс после фиксации убирает такую запись. Вне транзакции данные
+    уже зафиксированы, и второй сброс не нужен.
+    """
+    func(*args)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: func(*args))
+
+
+def purge_after_commit(tags):
+    after_commit(purge_pages, set(tags))
+
+
+def invalidate_after_commit(feeds):
+    after_commit(counts.invalidate_counts, set(feeds))
+
+
+def post_feeds(post):
+    feeds = {
+        counts.index_feed(),
+        counts.author_feed(post.author_id),
+    }
+    for group_id in (post.group_id, post._initial_group_id):
+        if group_id is not None:
+            feeds.add(counts.group_feed(group_id))
+    # у читаемых напрямую авторов подписчиков слишком много: их счётчики
+    # лент не сбрасываются поштучно, а доживают свой срок
+    if not timeline.is_pulled(post.author_id):
+        followers = Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user_id', flat=True)
+        feeds.update(counts.follow_feed(user_id) for user_id in followers)
+    return feeds
+
+
+def post_pages(post):
+    tags = {'index', f'post:{post.pk}', f'author:{post.author_id}'}
+    for group_id in (post.group_id, post._initial_group_id):
+        if group_id is not None:
+            tags.add(f'group:{group_id}')
+    return tags
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        bump(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    purge_after_commit(post_pages(instance))
+    if created:
+        bump_user(instance.author_id, 'posts_count', 1)
+        bump_group(instance.group_id, 1)
+        timeline.fan_out(instance)
+        invalidate_after_commit(post_feeds(instance))
+    else:
+        if instance.group_id != instance._initial_group_id:
+            bump_group(instance._initial_group_id, -1)
+            bump_group(instance.group_id, 1)
+            invalidate_after_commit(post_feeds(instance))
+        if (
+            'image' not in instance.get_deferred_fields()
+            and instance._initial_image != instance.image.name
+        ):
+            release_image(instance.image, instance._initial_image)
+    instance._initial_group_id = instance.group_id
+    if 'image' not in instance.get_deferred_fields():
+        instance._initial_image = instance.image.name
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    purge_after_commit(post_pages(instance))
+    bump_user(instance.author_id, 'posts_count', -1)
+    bump_group(instance.group_id, -1)
+    invalidate_after_commit(post_feeds(instance))
+    release_image(instance.image, instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        bump(Post.objects.filter(pk=instance.post_id), 'comments_count', 1)
+        purge_after_commit(post_pages(instance.post))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    bump(Post.objects.filter(pk=instance.post_id), 'comments_count', -1)
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        purge_after_commit(post_pages(post))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        bump_user(instance.author_id, 'followers_count', 1)
+        bump_user(instance.user_id, 'following_count', 1)
+        # посты читаемого напрямую автора подмешиваются при чтении, а в
+        # ленте они только вытеснили бы разложенные записи
+        if not timeline.is_pulled(instance.author_id):
+            timeline.backfill(instance.user_id, instance.author_id)
+    invalidate_after_commit([counts.follow_feed(instance.user_id)])
+    purge_after_commit([
+        f'author:{instance.author_id}', f'author:{instance.user_id}'
+    ])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump_user(instance.author_id, 'followers_count', -1)
+    bump_user(instance.user_id, 'following_count', -1)
+    timeline.remove_author(instance.user_id, instance.author_id)
+    if UserStats.objects.filter(
+        user_id=instance.author_id,
+        followers_count=settings.POSTS_TIMELINE_PUSH_LIMIT,
+    ).exists():
+        timeline.backfill_followers(instance.author_id)
+    invalidate_after_commit([counts.follow_feed(instance.user_id)])
+    purge_after_commit([
+        f'author:{instance.author_id}', f'author:{instance.user_id}'
+    ])
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    if created:
+        UserStats.objects.bulk_create(
+            [UserStats(user=instance)], ignore_conflicts=True
+        )
+        # SQLite переиспользует id удалённых строк, поэтому новый
+        # пользователь не должен получить счётчики и страницы
+        # предшественника.
+        invalidate_after_commit([
+            counts.author_feed(instance.pk),
+            counts.follow_feed(instance.pk),
+        ])
+        purge_after_commit([f'author:{instance.pk}'])
+    elif update_fields is None or set(update_fields) != {'last_login'}:
+        # Имя автора есть на карточках всех лент, где он публиковался
+        groups = Post.objects.filter(author=instance).exclude(
+            group=None
+        ).values_list('group_id', flat=True).distinct()
+        purge_after_commit(
+            ['index', f'author:{instance.pk}']
+            + [f'group:{group_id}' for group_id in groups]
+        )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if created:
+        invalidate_after_commit([counts.group_feed(instance.pk)])
+    purge_after_commit([f'group:{instance.pk}'])
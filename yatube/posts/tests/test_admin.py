@@ -0,0 +1,109 @@
+import datetime as dt
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post
+from posts.paginators import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.admin, text='Тестовый пост', group=cls.group
+        )
+        cls.old_post = Post.objects.create(author=cls.admin, text='Старый')
+        Post.objects.filter(pk=cls.old_post.pk).update(
+            pub_date=timezone.make_aware(dt.datetime(2020, 3, 15))
+        )
+        cls.follower = User.objects.create_user(username='HasNoName')
+        Comment.objects.create(post=cls.post, author=cls.admin, text='Да')
+        Follow.objects.create(user=cls.follower, author=cls.admin)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, data=None):
+        url = reverse(f'admin:posts_{model}_changelist')
+        return self.client.get(url, data)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        for model in ('post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                with CaptureQueriesContext(connection) as few:
+                    self.changelist(model)
+                Post.objects.bulk_create(
+                    Post(author=self.follower, text=f'Пост {number}')
+                    for number in range(5)
+                )
+                for post in Post.objects.filter(author=self.follower):
+                    Comment.objects.create(
+                        post=post, author=self.follower, text='Ещё'
+                    )
+                with CaptureQueriesContext(connection) as many:
+                    self.changelist(model)
+                self.assertEqual(len(many), len(few))
+                Post.objects.filter(author=self.follower).delete()
+
+    def test_pub_month_filter_drills_down(self):
+        response = self.changelist('post', {'pub_month': '2020'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.old_post]
+        )
+        self.assertContains(response, '?pub_month=2020-03')
+        response = self.changelist('post', {'pub_month': '2020-04'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+
+    def test_foreign_keys_use_autocomplete(self):
+        url = reverse('admin:posts_post_change', args=[self.post.pk])
+        response = self.client.get(url)
+        form = response.context['adminform'].form
+        for field in ('author', 'group'):
+            with self.subTest(field=field):
+                self.assertEqual(
+                    type(form.fields[field].widget.widget).__name__,
+                    'AutocompleteSelect',
+                )
+
+
+class EstimatedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {number}')
+            for number in range(3)
+        )
+
+    @override_settings(POSTS_ESTIMATED_COUNT_MIN=1)
+    def test_unfiltered_count_is_estimated(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Post.objects.create(author=self.user, text='После статистики')
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, 3)
+
+    @override_settings(POSTS_ADMIN_COUNT_LIMIT=2)
+    def test_filtered_count_is_capped(self):
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(author=self.user), 1
+        )
+        self.assertEqual(paginator.count, 2)
@@ -0,0 +1,159 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.caching import LOCK_KEY, STATS, cached
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_anonymous_pages_are_cached(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_query_string_is_part_of_key(self):
+        self.guest_client.get(self.urls[0])
+        response = self.guest_client.get(self.urls[0], {'cursor': ''})
+        self.assertIsNotNone(response.context)
+
+    def test_post_edit_purges_its_pages(self):
+        for url in self.urls:
+            self.guest_client.get(url)
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            {'text': 'Отредактированный пост', 'group': self.group.pk},
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Отредактированный пост')
+
+    def test_comment_purges_post_detail(self):
+        url = self.urls[3]
+        self.guest_client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Новый комментарий'
+        )
+        self.assertContains(self.guest_client.get(url), 'Новый комментарий')
+
+    def test_follow_purges_profile(self):
+        url = self.urls[2]
+        self.assertContains(self.guest_client.get(url), 'Подписчиков: 0')
+        follower = User.objects.create_user(username='HasNoName')
+        Follow.objects.create(user=follower, author=self.user)
+        self.assertContains(self.guest_client.get(url), 'Подписчиков: 1')
+
+    def test_other_pages_stay_cached(self):
+        other = User.objects.create_user(username='other')
+        url = reverse('posts:profile', kwargs={'username': 'other'})
+        self.guest_client.get(url)
+        Post.objects.create(author=self.user, text='Ещё пост')
+        with self.assertNumQueries(0):
+            self.guest_client.get(url)
+        self.assertEqual(other.posts.count(), 0)
+
+    def test_pages_purged_again_after_commit(self):
+        callbacks = []
+        with mock.patch(
+            'posts.signals.transaction.on_commit', callbacks.append
+        ):
+            Post.objects.create(author=self.user, text='Ещё пост')
+        # страница, закэшированная до COMMIT, сбрасывается после него
+        self.guest_client.get(self.urls[0])
+        for callback in callbacks:
+            callback()
+        response = self.guest_client.get(self.urls[0])
+        self.assertIsNotNone(response.context)
+
+    def test_authorized_pages_are_not_cached(self):
+        self.authorized_client.get(self.urls[0])
+        response = self.authorized_client.get(self.urls[0])
+        self.assertIsNotNone(response.context)
+
+
+class StampedeProtectionTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        STATS.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return self.calls
+
+    def test_hit_and_miss(self):
+        self.assertEqual(cached('key', self.compute, 60), 1)
+        self.assertEqual(cached('key', self.compute, 60), 1)
+        self.assertEqual(STATS['miss'], 1)
+        self.assertEqual(STATS['hit'], 1)
+
+    def test_stale_value_served_while_other_recomputes(self):
+        cached('key', self.compute, 60)
+        self.assertTrue(cache.add(LOCK_KEY.format('key'), 1))
+        self.assertEqual(
+            cached('key', self.compute, 60, is_fresh=lambda value: False), 1
+        )
+        self.assertEqual(STATS['stale'], 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_expired_value_recomputed_once(self):
+        cached('key', self.compute, 0)
+        self.assertEqual(cached('key', self.compute, 60), 2)
+        self.assertEqual(cached('key', self.compute, 60), 2)
+        self.assertEqual(STATS['early'], 1)
+
+    @override_settings(POSTS_CACHE_EARLY_BETA=10 ** 9)
+    def test_expensive_value_recomputed_early(self):
+        cache.set('key', (1, time.time() + 60, 1), 60)
+        self.assertEqual(cached('key', self.compute, 60), 1)
+        self.assertEqual(STATS['early'], 1)
+
+    @override_settings(POSTS_CACHE_LOCK_WAIT=0.1)
+    def test_waits_for_other_recompute(self):
+        cache.add(LOCK_KEY.format('key'), 1)
+        self.assertEqual(cached('key', self.compute, 60), 1)
+        self.assertEqual(STATS['lock_wait'], 1)
+
+    def test_lock_released_on_error(self):
+        def fail():
+            raise ValueError
+        with self.assertRaises(ValueError):
+            cached('key', fail, 60)
+        self.assertEqual(cached('key', self.compute, 60), 1)
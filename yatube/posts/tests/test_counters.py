@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        Post.objects.get(pk=self.post.pk).delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_group_change_moves_counter(self):
+        other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        post = Post.objects.get(pk=self.post.pk)
+        post.group = other_group
+        post.save()
+        self.group.refresh_from_db()
+        other_group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(other_group.posts_count, 1)
+
+    def test_comment_and_follow_counters(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.follower, text='Комментарий'
+        )
+        Follow.objects.create(user=self.follower, author=self.user)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.stats(self.user).followers_count, 1)
+        self.assertEqual(self.stats(self.follower).following_count, 1)
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_saving_stale_post_keeps_counter(self):
+        stale_post = Post.objects.get(pk=self.post.pk)
+        Comment.objects.create(
+            post=self.post, author=self.follower, text='Комментарий'
+        )
+        stale_post.text = 'Новый текст'
+        stale_post.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_reconcile_fixes_drift(self):
+        UserStats.objects.filter(user=self.user).update(posts_count=7)
+        Group.objects.update(posts_count=0)
+        UserStats.objects.filter(user=self.follower).delete()
+        call_command('reconcile_counters', batch_size=1, stdout=StringIO())
+        self.group.refresh_from_db()
+        self.assertEqual(self.stats(self.user).posts_count, 1)
+        self.assertEqual(self.stats(self.follower).posts_count, 0)
+        self.assertEqual(self.group.posts_count, 1)
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.counts import author_feed, count_posts, feed_count, group_feed
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def count_queries(queries):
+    return sum(
+        'COUNT(' in query['sql'].upper()
+        for query in queries.captured_queries
+    )
+
+
+class FeedCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_profile_counts_once(self):
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(count_queries(queries), 1)
+        self.assertEqual(response.context['count'], 1)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertEqual(count_queries(queries), 0)
+
+    def test_post_save_and_delete_invalidate_count(self):
+        feed = author_feed(self.user.pk)
+        posts = self.user.posts.all()
+        self.assertEqual(feed_count(feed, posts), 1)
+        new_post = Post.objects.create(author=self.user, text='Ещё пост')
+        self.assertEqual(feed_count(feed, posts), 2)
+        new_post.delete()
+        self.assertEqual(feed_count(feed, posts), 1)
+
+    def test_group_change_invalidates_both_groups(self):
+        other_group = Group.objects.create(
+            title='Другая группа',
+            slug='other-slug',
+            description='Тестовое описание',
+        )
+        old_feed = group_feed(self.group.pk)
+        new_feed = group_feed(other_group.pk)
+        self.assertEqual(feed_count(old_feed, self.group.posts.all()), 1)
+        self.assertEqual(feed_count(new_feed, other_group.posts.all()), 0)
+        self.post.group = other_group
+        self.post.save()
+        self.assertEqual(feed_count(old_feed, self.group.posts.all()), 0)
+        self.assertEqual(feed_count(new_feed, other_group.posts.all()), 1)
+
+    @override_settings(POSTS_ESTIMATED_COUNT_MIN=1)
+    def test_unfiltered_feed_uses_estimate(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(count_posts(Post.objects.all()), 1)
+        self.assertEqual(count_queries(queries), 0)
@@ -13,7 +13,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=False)
 class PostFormTest(TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -75,8 +75,8 @@ class PostFormTest(TestCase):
             Post.objects.filter(
                 group=self.group,
                 text='Тестовый текст',
-                image='posts/small.gif',
-            ).exists()
+                image=self.post.image.name,
+            ).exclude(pk=self.post.pk).exists()
         )
         self.assertEqual(Post.objects.count(), posts_count + 1)
 
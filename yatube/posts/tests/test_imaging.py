@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from PIL import Image
+
+from posts import thumbnails
+from posts.imaging import normalize_image
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+ORIENTATION = 0x0112
+
+
+def make_image(size, image_format='JPEG', orientation=None):
+    image = Image.new('RGB', size, (200, 30, 30))
+    options = {}
+    if orientation is not None:
+        exif = Image.Exif()
+        exif[ORIENTATION] = orientation
+        options['exif'] = exif.tobytes()
+    out = BytesIO()
+    image.save(out, image_format, **options)
+    return out.getvalue()
+
+
+def open_image(data):
+    return Image.open(BytesIO(data))
+
+
+class NormalizeImageTest(SimpleTestCase):
+    def test_rotates_caps_and_strips_metadata(self):
+        data = make_image((4000, 1000), orientation=6)
+        result = open_image(normalize_image(data, 2000, 85))
+        self.assertEqual(result.format, 'JPEG')
+        self.assertEqual(result.size, (500, 2000))
+        self.assertFalse(result.getexif())
+
+    def test_normalized_image_is_kept(self):
+        data = normalize_image(make_image((3000, 300), 'PNG'), 1000, 85)
+        self.assertIsNone(normalize_image(data, 1000, 85))
+
+    def test_png_stays_png(self):
+        data = make_image((3000, 300), 'PNG')
+        result = open_image(normalize_image(data, 1000, 85))
+        self.assertEqual((result.format, result.size), ('PNG', (1000, 100)))
+
+    def test_animated_png_is_kept(self):
+        frames = [
+            Image.new('RGB', (3000, 300), color)
+            for color in ((200, 30, 30), (30, 200, 30))
+        ]
+        out = BytesIO()
+        frames[0].save(out, 'PNG', save_all=True, append_images=frames[1:])
+        self.assertIsNone(normalize_image(out.getvalue(), 1000, 85))
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    POSTS_IMAGE_MAX_SIZE=500,
+    POSTS_THUMBNAILS_ASYNC=False,
+)
+class IngestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.user,
+            text='Тестовый пост',
+            image=SimpleUploadedFile(
+                'photo.jpg', make_image((1000, 800), orientation=3),
+                'image/jpeg',
+            ),
+        )
+
+    def test_ingest_replaces_original(self):
+        post = self.create_post()
+        old_name = post.image.name
+        new_name = thumbnails.ingest(post.pk, old_name)
+        post.refresh_from_db()
+        self.assertEqual(post.image.name, new_name)
+        self.assertRegex(
+            new_name, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$'
+        )
+        self.assertFalse(default_storage.exists(old_name))
+        with default_storage.open(new_name) as image:
+            self.assertEqual(Image.open(image).size, (500, 400))
+
+    @override_settings(POSTS_THUMBNAILS_ASYNC=True)
+    def test_ingest_runs_in_process_pool(self):
+        post = self.create_post()
+        try:
+            new_name = thumbnails.ingest(post.pk, post.image.name)
+        finally:
+            thumbnails._process_pool.shutdown()
+            thumbnails._process_pool = None
+        self.assertNotEqual(new_name, post.image.name)
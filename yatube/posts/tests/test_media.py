@@ -0,0 +1,189 @@
+import io
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+
+from core.models import StoredFile
+from posts import media, thumbnails
+from posts.models import Post
+from posts.tests.test_thumbnails import SMALL_GIF
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=False)
+class MigrateMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_legacy_post(self, name, content=None):
+        if content is not None:
+            FileSystemStorage().save(name, ContentFile(content))
+        return Post.objects.create(
+            author=self.user, text='Тестовый пост', image=name
+        )
+
+    def migrate(self):
+        out = io.StringIO()
+        call_command('migrate_media', batch_size=1, stdout=out)
+        return out.getvalue()
+
+    def test_moves_and_deduplicates_legacy_files(self):
+        first = self.create_legacy_post('posts/a.gif', b'same')
+        second = self.create_legacy_post('posts/b.gif', b'same')
+        shared = self.create_legacy_post('posts/a.gif')
+        self.create_legacy_post('posts/missing.gif')
+        output = self.migrate()
+        self.assertIn('Перенесено картинок: 3, не найдено файлов: 1', output)
+        names = {
+            Post.objects.get(pk=post.pk).image.name
+            for post in (first, second, shared)
+        }
+        self.assertEqual(len(names), 1)
+        name = names.pop()
+        self.assertTrue(default_storage.is_content_addressed(name))
+        self.assertTrue(default_storage.exists(name))
+        self.assertFalse(default_storage.exists('posts/a.gif'))
+        self.assertFalse(default_storage.exists('posts/b.gif'))
+
+    def test_rerun_resumes(self):
+        self.create_legacy_post('posts/c.gif', b'content')
+        self.migrate()
+        self.assertIn('Перенесено картинок: 0', self.migrate())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=False)
+class CollectMediaTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.live = Post.objects.create(
+            author=self.user, text='Тестовый пост',
+            image=SimpleUploadedFile('live.gif', SMALL_GIF, 'image/gif'),
+        )
+        thumbnails.generate(self.live.pk, self.live.image.name)
+        replaced = Post.objects.create(
+            author=self.user, text='Тестовый пост',
+            image=SimpleUploadedFile('old.gif', SMALL_GIF + b'old'),
+        )
+        thumbnails.generate(replaced.pk, replaced.image.name)
+        self.orphan = replaced.image.name
+        self.orphan_thumbnail = thumbnails.thumbnail_file(self.orphan).name
+        replaced.delete()
+        self.stray = default.storage.save(
+            'cache/ab/cd/stray.jpg', ContentFile(b'stray')
+        )
+
+    def collect(self, **options):
+        out = io.StringIO()
+        call_command('collect_media', min_age=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_dry_run_only_reports(self):
+        output = self.collect(dry_run=True)
+        self.assertIn('Оригиналы: файлов 1, будет освобождено', output)
+        self.assertIn('Миниатюры без записи в sorl: файлов 1', output)
+        self.assertTrue(default_storage.exists(self.orphan))
+        self.assertTrue(default.storage.exists(self.stray))
+
+    def test_deletes_unreferenced_files(self):
+        self.collect()
+        self.assertFalse(default_storage.exists(self.orphan))
+        self.assertFalse(default.storage.exists(self.orphan_thumbnail))
+        self.assertFalse(default.storage.exists(self.stray))
+        self.assertTrue(default_storage.exists(self.live.image.name))
+        self.assertIsNotNone(thumbnails.ready_url(self.live.image.name))
+        live_thumbnail = thumbnails.thumbnail_file(self.live.image.name)
+        self.assertTrue(default.storage.exists(live_thumbnail.name))
+
+    def test_recent_files_are_kept(self):
+        out = io.StringIO()
+        call_command('collect_media', stdout=out)
+        self.assertTrue(default_storage.exists(self.orphan))
+
+    def test_orphan_referenced_again_is_kept(self):
+        Post.objects.create(
+            author=self.user, text='Тот же файл', image=self.orphan
+        )
+        self.assertFalse(
+            media.purge_orphan(default_storage, self.orphan, min_age=0)
+        )
+        self.assertTrue(default_storage.exists(self.orphan))
+        self.assertTrue(StoredFile.objects.filter(name=self.orphan).exists())
+
+    def test_shared_image_counts_every_post(self):
+        name = self.live.image.name
+        for _ in range(2):
+            Post.objects.create(author=self.user, text='Копия', image=name)
+        self.assertEqual(media.references([name]), {name: 3})
+        StoredFile.objects.filter(name=name).update(refs=3)
+        self.collect()
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 3)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=False)
+@mock.patch('posts.signals.transaction.on_commit', lambda func: func())
+class ReleaseImageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create_post(self, content):
+        return Post.objects.create(
+            author=self.user, text='Тестовый пост',
+            image=SimpleUploadedFile('photo.gif', content, 'image/gif'),
+        )
+
+    def test_delete_releases_reference(self):
+        post = self.create_post(SMALL_GIF)
+        other = self.create_post(SMALL_GIF)
+        name = post.image.name
+        post.delete()
+        self.assertEqual(StoredFile.objects.get(name=name).refs, 1)
+        other.delete()
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        self.assertFalse(default_storage.exists(name))
+
+    def test_replaced_image_is_released(self):
+        post = self.create_post(SMALL_GIF + b'old')
+        old_name = post.image.name
+        post = Post.objects.get(pk=post.pk)
+        post.image = SimpleUploadedFile('new.gif', SMALL_GIF, 'image/gif')
+        post.save()
+        self.assertFalse(default_storage.exists(old_name))
+        post.text = 'Отредактированный пост'
+        post.save()
+        self.assertTrue(default_storage.exists(post.image.name))
@@ -0,0 +1,47 @@
+import time
+
+from django.template.loader import render_to_string
+from django.test import SimpleTestCase
+
+from posts.paginators import WindowedPaginator
+
+PAGINATOR_TEMPLATE = 'posts/includes/paginator.html'
+
+
+class WindowedPaginatorTest(SimpleTestCase):
+    def test_small_feed_shows_every_page(self):
+        paginator = WindowedPaginator(range(50), 10)
+        page_obj = paginator.get_page(3)
+        self.assertEqual(page_obj.page_window, [1, 2, 3, 4, 5])
+
+    def test_large_feed_shows_window(self):
+        paginator = WindowedPaginator(range(1000), 10)
+        ellipsis = WindowedPaginator.ELLIPSIS
+        windows = {
+            1: [1, 2, 3, 4, ellipsis, 100],
+            50: [1, ellipsis, 47, 48, 49, 50, 51, 52, 53, ellipsis, 100],
+            100: [1, ellipsis, 97, 98, 99, 100],
+        }
+        for number, window in windows.items():
+            with self.subTest(number=number):
+                page_obj = paginator.get_page(number)
+                self.assertEqual(page_obj.page_window, window)
+
+    def test_render_does_not_grow_with_feed(self):
+        """Бенчмарк: размер и время отрисовки не зависят от числа постов."""
+        results = {}
+        for num_posts in (1000, 1000000):
+            page_obj = WindowedPaginator(range(num_posts), 10).get_page(50)
+            start = time.perf_counter()
+            for _ in range(20):
+                html = render_to_string(
+                    PAGINATOR_TEMPLATE, {'page_obj': page_obj}
+                )
+            results[num_posts] = (
+                html, (time.perf_counter() - start) / 20
+            )
+        small_html, small_time = results[1000]
+        large_html, large_time = results[1000000]
+        self.assertEqual(small_html.count('<li'), large_html.count('<li'))
+        self.assertLess(len(large_html) - len(small_html), 100)
+        self.assertLess(large_time, small_time * 5 + 0.005)
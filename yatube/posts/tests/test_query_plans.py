@@ -0,0 +1,127 @@
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+from posts.views import NUM_VIEW_POST
+
+User = get_user_model()
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN')
+class QueryPlanTest(TestCase):
+    """Запросы лент идут по составным индексам без сортировки в памяти."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='HasNoName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост',
+            group=cls.group,
+        )
+        # ещё страница, чтобы у первой был курсор на следующую
+        for number in range(NUM_VIEW_POST):
+            Post.objects.create(
+                author=cls.user, text=f'Пост {number}', group=cls.group
+            )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.follower, author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.follower)
+
+    def plans(self, url, data=None, client=None):
+        client = client or self.client
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url, data)
+        plans = {}
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or 'sqlite_stat1' in sql:
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                plans[sql] = '\n'.join(row[-1] for row in cursor.fetchall())
+        return plans
+
+    def assertPlansUse(self, url, index, data=None, client=None):
+        plans = self.plans(url, data, client)
+        for sql, plan in plans.items():
+            with self.subTest(sql=sql):
+                self.assertNotIn('TEMP B-TREE', plan)
+        self.assertTrue(
+            any(f'INDEX {index}' in plan for plan in plans.values()),
+            f'{url} не использует индекс {index}',
+        )
+
+    def next_cursor(self, url, client):
+        cache.clear()
+        response = client.get(url, {'cursor': ''})
+        return response.context['page_obj'].next_cursor
+
+    def test_feeds_use_indexes(self):
+        feeds = {
+            reverse('posts:index'): 'post_pub_date',
+            reverse('posts:group_list', kwargs={
+                'slug': 'test-slug'
+            }): 'post_group_pub_date',
+            reverse('posts:profile', kwargs={
+                'username': 'auth'
+            }): 'post_author_pub_date',
+        }
+        feeds[reverse('posts:follow_index')] = 'timeline_user_pub_date'
+        for url, index in feeds.items():
+            client = self.client
+            if url == reverse('posts:follow_index'):
+                client = self.authorized_client
+            cursor = self.next_cursor(url, client)
+            self.assertIsNotNone(cursor)
+            for data in (None, {'cursor': ''}, {'cursor': cursor}):
+                with self.subTest(url=url, data=data):
+                    cache.clear()
+                    self.assertPlansUse(url, index, data, client)
+
+    def test_comments_use_index(self):
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.assertPlansUse(url, 'comment_post_created')
+
+    def test_follows_by_author_use_index(self):
+        followers = Follow.objects.filter(author=self.user).values_list(
+            'user_id', flat=True
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {followers.query}')
+            plan = '\n'.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('COVERING INDEX follow_author_user', plan)
+
+    def test_image_lookups_use_index(self):
+        queries = (
+            Post.objects.filter(image='posts/a.jpg').values('pk'),
+            Post.objects.filter(image__in=['posts/a.jpg']).order_by().values(
+                'image'
+            ),
+        )
+        for queryset in queries:
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = '\n'.join(row[-1] for row in cursor.fetchall())
+            self.assertIn('INDEX post_image', plan)
@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Post
+from posts.search import match_expression, search
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.exact = Post.objects.create(
+            author=cls.user, text='Котики котики котики'
+        )
+        cls.other = Post.objects.create(
+            author=cls.user, text='Про котики и собаки, и ещё много слов'
+        )
+        Post.objects.create(author=cls.user, text='Совсем про другое')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_results_ranked_by_relevance(self):
+        page = search('котики')
+        self.assertEqual(list(page), [self.exact, self.other])
+
+    def test_snippet_highlights_match_and_escapes_text(self):
+        post = Post.objects.create(author=self.user, text='<b>зебра</b>')
+        [result] = search('зебра')
+        self.assertEqual(result, post)
+        self.assertEqual(
+            result.snippet, '&lt;b&gt;<mark>зебра</mark>&lt;/b&gt;'
+        )
+
+    def test_keyset_pages(self):
+        first = search('котики', per_page=1)
+        self.assertTrue(first.has_next())
+        second = search('котики', first.next_cursor, per_page=1)
+        self.assertEqual(list(first) + list(second), [self.exact, self.other])
+        self.assertFalse(second.has_next())
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.get(pk=self.other.pk)
+        post.text = 'Только собаки'
+        post.save()
+        self.assertEqual(list(search('котики')), [self.exact])
+        self.assertEqual(list(search('собаки')), [post])
+        post.delete()
+        self.assertEqual(list(search('собаки')), [])
+
+    def test_query_syntax_is_not_passed_through(self):
+        self.assertEqual(match_expression('котики OR "'), '"котики" "OR"')
+        self.assertIsNone(match_expression('*:('))
+        self.assertEqual(list(search('*:(')), [])
+
+    def test_search_page(self):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'котики'}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [self.exact, self.other]
+        )
+        self.assertContains(response, '<mark>котики</mark>')
+        self.assertTemplateUsed(response, 'includes/article.html')
+
+
+class AdminSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'
+        )
+        cls.post = Post.objects.create(author=cls.admin, text='Котики')
+        Post.objects.create(author=cls.admin, text='Собаки')
+
+    def test_admin_search_uses_index(self):
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котики'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [self.post])
@@ -0,0 +1,141 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+PLACEHOLDER = 'img/thumbnail-placeholder.svg'
+
+
+def upload(name):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=False)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        thumbnails._submitted.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_pending_thumbnail_shows_placeholder(self):
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', image=upload('a.gif')
+        )
+        url = reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        with mock.patch.object(thumbnails, 'submit') as submit:
+            response = self.guest_client.get(url)
+            self.assertContains(response, PLACEHOLDER)
+            submit.assert_called_once_with(post.pk, post.image.name)
+            response = self.guest_client.get(url)
+        self.assertIsNotNone(response.context)
+
+    def test_generated_thumbnail_replaces_placeholder(self):
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', image=upload('b.gif')
+        )
+        url = reverse('posts:index')
+        with mock.patch.object(thumbnails, 'submit'):
+            self.assertContains(self.guest_client.get(url), PLACEHOLDER)
+        thumbnails.generate(post.pk, post.image.name)
+        response = self.guest_client.get(url)
+        self.assertNotContains(response, PLACEHOLDER)
+        self.assertContains(response, thumbnails.ready_url(post.image.name))
+
+    def test_responsive_variants(self):
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', image=upload('f.gif')
+        )
+        thumbnails.generate(post.pk, post.image.name)
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        post = response.context['post']
+        for image_format in thumbnails.FORMATS:
+            with self.subTest(image_format=image_format):
+                srcset = post.thumbnail_srcset[image_format]
+                self.assertIn(' 480w, ', srcset)
+                self.assertTrue(srcset.endswith(' 960w'))
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, 'loading="lazy"')
+        self.assertContains(
+            response, f'srcset="{post.thumbnail_srcset["JPEG"]}"'
+        )
+
+    def test_create_and_edit_schedule_generation(self):
+        with mock.patch.object(
+            thumbnails.transaction, 'on_commit', lambda func: func()
+        ):
+            self.authorized_client.post(reverse('posts:post_create'), {
+                'text': 'Пост с картинкой', 'image': upload('c.gif'),
+            })
+            post = Post.objects.get(text='Пост с картинкой')
+            self.assertIsNotNone(thumbnails.ready_url(post.image.name))
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                {'text': 'Пост с картинкой', 'image': upload('d.gif')},
+            )
+        post.refresh_from_db()
+        self.assertIn('d', post.image.name)
+        self.assertIsNotNone(thumbnails.ready_url(post.image.name))
+
+    def test_page_resolved_in_one_lookup(self):
+        posts = [
+            Post.objects.create(
+                author=self.user, text='Тестовый пост',
+                image=upload(f'page{number}.gif'),
+            )
+            for number in range(3)
+        ]
+        for post in posts:
+            thumbnails.generate(post.pk, post.image.name)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            thumbnails.attach_thumbnails(posts)
+        self.assertEqual(len(queries), 1)
+        self.assertTrue(all(post.thumbnail_url for post in posts))
+        with self.assertNumQueries(0):
+            thumbnails.attach_thumbnails(posts)
+
+    @override_settings(POSTS_THUMBNAILS_ASYNC=True)
+    def test_async_submit_runs_once_per_image(self):
+        with mock.patch.object(thumbnails, '_executor') as executor:
+            thumbnails.submit(1, 'posts/e.gif')
+            thumbnails.submit(1, 'posts/e.gif')
+        executor.submit.assert_called_once_with(
+            thumbnails.generate, 1, 'posts/e.gif', False
+        )
@@ -0,0 +1,136 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Follow, Post, TimelineEntry
+from posts.paginators import CursorPaginator
+from posts.signals import post_feeds
+from posts.timeline import FEED_KEY, follow_feed_posts, timeline_posts
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='auth')
+        cls.follower = User.objects.create_user(username='HasNoName')
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertEqual(list(timeline_posts(self.follower)), [post])
+        self.assertFalse(timeline_posts(self.author).exists())
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(3)
+        ]
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(
+            set(timeline_posts(self.follower)), set(posts)
+        )
+        follow.delete()
+        self.assertFalse(timeline_posts(self.follower).exists())
+
+    @override_settings(POSTS_TIMELINE_SIZE=2)
+    def test_timeline_is_capped(self):
+        Follow.objects.create(user=self.follower, author=self.author)
+        for number in range(4):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        entries = TimelineEntry.objects.filter(user=self.follower)
+        self.assertEqual(entries.count(), 2)
+        self.assertEqual(
+            list(entries.values_list('post__text', flat=True)),
+            ['Пост 3', 'Пост 2'],
+        )
+
+    @override_settings(POSTS_TIMELINE_SIZE=2)
+    def test_new_post_trims_timelines_in_one_query(self):
+        Post.objects.create(author=self.author, text='Пост')
+        followers = [
+            User.objects.create_user(username=f'follower{number}')
+            for number in range(5)
+        ]
+        for follower in followers:
+            Follow.objects.create(user=follower, author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            Post.objects.create(author=self.author, text='Ещё')
+        deletes = [
+            query for query in queries.captured_queries
+            if query['sql'].lstrip().startswith('DELETE')
+        ]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user__in=followers).count(), 10
+        )
+
+    @override_settings(POSTS_TIMELINE_PUSH_LIMIT=1)
+    def test_popular_author_is_pulled_and_merged(self):
+        star = User.objects.create_user(username='star')
+        other_follower = User.objects.create_user(username='tempname')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=star)
+        Follow.objects.create(user=other_follower, author=star)
+        posts = []
+        for number in range(6):
+            author = star if number % 2 else self.author
+            posts.append(
+                Post.objects.create(author=author, text=f'Пост {number}')
+            )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post__author=star).exists()
+        )
+        feed = follow_feed_posts(self.follower)
+        posts.reverse()
+        self.assertEqual(feed.count(), 6)
+        self.assertEqual(feed[1:4], posts[1:4])
+        paginator = CursorPaginator(feed, 4, key=FEED_KEY)
+        page_obj = paginator.get_page(None)
+        self.assertEqual(list(page_obj), posts[:4])
+        next_page = paginator.get_page(page_obj.next_cursor)
+        self.assertEqual(list(next_page), posts[4:])
+
+    @override_settings(POSTS_TIMELINE_PUSH_LIMIT=1)
+    def test_author_back_under_limit_is_backfilled(self):
+        other_follower = User.objects.create_user(username='tempname')
+        Follow.objects.create(user=self.follower, author=self.author)
+        follow = Follow.objects.create(user=other_follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertFalse(timeline_posts(self.follower).exists())
+        self.assertEqual(list(follow_feed_posts(self.follower)), [post])
+        follow.delete()
+        self.assertEqual(list(timeline_posts(self.follower)), [post])
+        self.assertEqual(list(follow_feed_posts(self.follower)), [post])
+
+    @override_settings(POSTS_TIMELINE_SIZE=3, POSTS_TIMELINE_PUSH_LIMIT=1)
+    def test_following_pulled_author_keeps_timeline(self):
+        star = User.objects.create_user(username='star')
+        for number in range(2):
+            follower = User.objects.create_user(username=f'fan{number}')
+            Follow.objects.create(user=follower, author=star)
+        Follow.objects.create(user=self.follower, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(3)
+        ]
+        for number in range(3):
+            Post.objects.create(author=star, text=f'Звезда {number}')
+        Follow.objects.create(user=self.follower, author=star)
+        self.assertEqual(
+            list(timeline_posts(self.follower)), posts[::-1]
+        )
+        self.assertEqual(follow_feed_posts(self.follower).count(), 6)
+
+    @override_settings(POSTS_TIMELINE_PUSH_LIMIT=1)
+    def test_pulled_author_post_skips_follower_counts(self):
+        for number in range(3):
+            follower = User.objects.create_user(username=f'follower{number}')
+            Follow.objects.create(user=follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Тестовый пост')
+        self.assertFalse(
+            any(feed.startswith('follow:') for feed in post_feeds(post))
+        )
@@ -5,18 +5,22 @@ from django.core.cache import cache
 from django import forms
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.db import connection
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Follow, Group, Post
+from core.query_budget import QueryBudgetTestMixin
+from posts.models import Comment, Follow, Group, Post
 from posts.forms import PostForm
 
 User = get_user_model()
+NUM_AUTHORS = 6
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAILS_ASYNC=False)
 class PostPagesTest(TestCase):
     @classmethod
     def setUpClass(cls) -> None:
@@ -55,6 +59,7 @@ class PostPagesTest(TestCase):
         )
 
     def setUp(self):
+        cache.clear()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
         self.hasnoname_user = Client()
@@ -68,23 +73,18 @@ class PostPagesTest(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def test_cache(self):
-        response_before_del = self.authorized_client.get(
-            reverse('posts:index')
-        )
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertTemplateNotUsed(response, 'includes/article.html')
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Отредактированный пост'
+        post.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertTemplateUsed(response, 'includes/article.html')
+        self.assertContains(response, 'Отредактированный пост')
         Post.objects.get(pk=self.post.pk).delete()
-        response_after_del = self.authorized_client.get(
-            reverse('posts:index')
-        )
-        self.assertEqual(
-            response_before_del.content, response_after_del.content
-        )
-        cache.clear()
-        response_after_clear_cache = self.authorized_client.get(
-            reverse('posts:index')
-        )
-        self.assertNotEqual(
-            response_after_clear_cache.content, response_after_del.content
-        )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Отредактированный пост')
 
     def test_pages_uses_correct_template(self):
         templates_pages_names = {
@@ -320,6 +320,7 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(obj_posts)
 
     def setUp(self):
+        cache.clear()
         self.client = Client()
         self.url_pages_names = [
             reverse('posts:index'),
@@ -343,3 +344,83 @@ class PaginatorViewsTest(TestCase):
             with self.subTest(item=item):
                 response = self.client.get(item, paginator_page_2)
                 self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_pagination_walks_feed(self):
+        for item in self.url_pages_names:
+            with self.subTest(item=item):
+                first_page = self.client.get(item, {'cursor': ''})
+                page_obj = first_page.context['page_obj']
+                self.assertEqual(len(page_obj), 10)
+                self.assertFalse(page_obj.has_previous())
+                second_page = self.client.get(
+                    item, {'cursor': page_obj.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), 3)
+                self.assertFalse(second_page.has_next())
+                back_page = self.client.get(
+                    item, {'cursor': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(page_obj))
+
+    def test_cursor_pagination_without_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'), {'cursor': ''})
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_broken_cursor_shows_first_page(self):
+        response = self.client.get(reverse('posts:index'), {'cursor': '!!'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+
+
+class QueryBudgetViewsTest(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.follower = User.objects.create_user(username='HasNoName')
+        cls.authors = [
+            User.objects.create_user(username=f'auth{number}')
+            for number in range(NUM_AUTHORS)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.follower, author=author)
+            for _ in range(2):
+                cls.post = Post.objects.create(
+                    author=author,
+                    text='Тестовый пост',
+                    group=cls.group,
+                )
+        for author in cls.authors:
+            Comment.objects.create(
+                post=cls.post, author=author, text='Комментарий'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def test_views_fit_query_budget(self):
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={
+                'slug': 'test-slug'
+            }),
+            reverse('posts:profile', kwargs={
+                'username': self.post.author
+            }),
+            reverse('posts:post_detail', kwargs={
+                'post_id': self.post.pk
+            }),
+            reverse('posts:follow_index'),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertWithinQueryBudget(url, self.follower_client)
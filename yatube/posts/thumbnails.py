@@ -0,0 +1,250 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import features
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .caching import purge_pages, skip_page_cache
+from .imaging import normalize_image
+
+logger = logging.getLogger(__name__)
+
+# Миниатюры карточки и страницы поста: ширины для srcset и форматы.
+# WebP добавляется, только если Pillow собран с его поддержкой.
+WIDTH, HEIGHT = 960, 339
+WIDTHS = (480, 960)
+FORMATS = ('JPEG', 'WEBP') if features.check('webp') else ('JPEG',)
+OPTIONS = {'crop': 'center', 'upscale': True}
+# Вариант для src; его готовность означает, что готовы и остальные
+DEFAULT_VARIANT = (WIDTH, 'JPEG')
+VARIANTS = [
+    (width, image_format)
+    for image_format in FORMATS for width in WIDTHS
+    if (width, image_format) != DEFAULT_VARIANT
+] + [DEFAULT_VARIANT]
+
+_executor = None
+_process_pool = None
+# Имена, уже поставленные в очередь этим процессом. Неудачные остаются
+# здесь, чтобы битая картинка не пересоздавалась на каждом запросе.
+_submitted = set()
+_lock = threading.Lock()
+
+
+def geometry(width):
+    return f'{width}x{round(width * HEIGHT / WIDTH)}'
+
+
+def variant_options(image_format):
+    return {**OPTIONS, 'format': image_format}
+
+
+def thumbnail_file(name, variant=DEFAULT_VARIANT):
+    """Файл миниатюры, который get_thumbnail создал бы для name.
+
+    Имя считается так же, как в sorl, но без чтения исходника.
+    """
+    width, image_format = variant
+    backend = default.backend
+    source = ImageFile(name)
+    options = variant_options(image_format)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return ImageFile(
+        backend._get_thumbnail_filename(source, geometry(width), options),
+        default.storage,
+    )
+
+
+def kvstore_get_many(keys):
+    """Сырые значения key-value хранилища sorl одним get_many.
+
+    Промахи кэша добираются из таблицы одним запросом и кладутся
+    обратно, как это делает сам cached_db KVStore по одному ключу.
+    """
+    kvstore = default.kvstore
+    empty = cached_db_kvstore.EMPTY_VALUE
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {key: kvstore._get_raw(key) for key in keys}
+    values = kvstore.cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        found = dict(KVStoreModel.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        fill = {key: found.get(key, empty) for key in missing}
+        kvstore.cache.set_many(fill, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        values.update(fill)
+    return {
+        key: None if value == empty else value
+        for key, value in values.items()
+    }
+
+
+def ready_variants(names):
+    """URL готовых вариантов миниатюр: {имя: {вариант: url}}."""
+    keys = {
+        (name, variant): add_prefix(thumbnail_file(name, variant).key)
+        for name in set(names) for variant in VARIANTS
+    }
+    values = kvstore_get_many(list(keys.values()))
+    ready = {name: {} for name, variant in keys}
+    for (name, variant), key in keys.items():
+        value = values.get(key)
+        if value:
+            ready[name][variant] = deserialize_image_file(value).url
+    return ready
+
+
+def ready_url(name):
+    """URL миниатюры для src или None, если она ещё не создана."""
+    return ready_variants([name])[name].get(DEFAULT_VARIANT)
+
+
+def srcsets(variants):
+    """Строки srcset по форматам: {'JPEG': 'url 480w, url 960w', ...}."""
+    return {
+        image_format: ', '.join(
+            f'{variants[width, image_format]} {width}w'
+            for width in WIDTHS if (width, image_format) in variants
+        )
+        for image_format in FORMATS
+    }
+
+
+def ingest(post_id, name):
+    """Заменяет загруженный оригинал нормализованным (см. normalize_image).
+
+    Декодирование идёт в пуле процессов. Новый файл сохраняется под
+    новым именем, пост переключается на него, и только потом старый
+    удаляется, так что картинка не пропадает ни на миг.
+    """
+    from .models import Post
+    global _process_pool
+    with default_storage.open(name) as image:
+        data = image.read()
+    args = (
+        data, settings.POSTS_IMAGE_MAX_SIZE, settings.POSTS_IMAGE_QUALITY
+    )
+    if settings.POSTS_THUMBNAILS_ASYNC:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                settings.POSTS_IMAGE_INGEST_PROCESSES,
+                multiprocessing.get_context('spawn'),
+            )
+        result = _process_pool.submit(normalize_image, *args).result()
+    else:
+        result = normalize_image(*args)
+    if result is None:
+        return name
+    # под именем загрузки: уже хэшированное имя хранилище разложило бы
+    # по подкаталогам второй раз
+    upload_to = Post._meta.get_field('image').upload_to
+    new_name = default_storage.save(
+        os.path.join(upload_to, os.path.basename(name)), ContentFile(result)
+    )
+    if Post.objects.filter(pk=post_id, image=name).update(image=new_name):
+        default_storage.delete(name)
+    else:
+        # Картинку успели заменить, нормализованная копия не нужна
+        default_storage.delete(new_name)
+    return new_name
+
+
+def generate(post_id, name, uploaded=False):
+    """Создаёт миниатюру и сбрасывает страницы, где была заглушка.
+
+    Свежезагруженная картинка (uploaded) сначала проходит ingest.
+    """
+    from .models import Post
+    from .signals import post_pages
+    source = name
+    try:
+        if uploaded:
+            name = ingest(post_id, name)
+        for width, image_format in VARIANTS:
+            thumbnail = get_thumbnail(
+                name, geometry(width), **variant_options(image_format)
+            )
+        if default.kvstore.get(thumbnail) is None:
+            logger.warning('Не удалось создать миниатюру %s', name)
+            return
+        with _lock:
+            _submitted.discard(source)
+        post = Post.objects.filter(pk=post_id).first()
+        if post is not None:
+            purge_pages(post_pages(post))
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        close_old_connections()
+
+
+def submit(post_id, name, uploaded=False):
+    with _lock:
+        if name in _submitted:
+            return
+        _submitted.add(name)
+    if not settings.POSTS_THUMBNAILS_ASYNC:
+        generate(post_id, name, uploaded)
+        return
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            settings.POSTS_THUMBNAIL_WORKERS, 'thumbnails'
+        )
+    _executor.submit(generate, post_id, name, uploaded)
+
+
+def schedule(post):
+    """Ставит новую картинку поста в очередь после коммита транзакции."""
+    if post.image:
+        name = post.image.name
+        transaction.on_commit(lambda: submit(post.pk, name, uploaded=True))
+
+
+def attach_thumbnails(posts):
+    """Проставляет постам post.thumbnail_url и post.thumbnail_srcset.
+
+    Миниатюры всей страницы ищутся одним обращением к хранилищу sorl.
+    Пустая строка — картинка есть, но миниатюра ещё не готова: шаблон
+    покажет заглушку, генерация ставится в очередь, а страница с
+    заглушкой не попадает в кэш.
+    """
+    ready = ready_variants(
+        post.image.name for post in posts if post.image
+    )
+    for post in posts:
+        post.thumbnail_url = None
+        post.thumbnail_srcset = {}
+        if not post.image:
+            continue
+        variants = ready[post.image.name]
+        if DEFAULT_VARIANT not in variants:
+            submit(post.pk, post.image.name)
+            if not settings.POSTS_THUMBNAILS_ASYNC:
+                variants = ready_variants([post.image.name])[post.image.name]
+        post.thumbnail_url = variants.get(DEFAULT_VARIANT, '')
+        post.thumbnail_srcset = srcsets(variants)
+        if not post.thumbnail_url:
+            skip_page_cache()
+    return posts
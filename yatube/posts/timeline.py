@@ -0,0 +1,223 @@
+import heapq
+from itertools import islice
+from operator import attrgetter
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import F
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+# Поля ключа ленты подписок: сортировка и курсор идут по записям ленты,
+# чтобы запрос читал индекс timeline_user_pub_date
+FEED_KEY = ('feed_date', 'feed_post')
+
+# Лишние записи лент удаляются одним запросом: номер записи в ленте
+# своего пользователя считается оконной функцией по тому же индексу
+TRIM_SQL = '''
+    DELETE FROM {table} WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC
+            ) AS position
+            FROM {table} WHERE {users}
+        ) WHERE position > %s
+    )
+'''
+
+
+class MergedFeed:
+    """Несколько отсортированных лент, слитых в одну при чтении.
+
+    Поддерживает ровно то, что нужно пагинаторам: filter, exclude,
+    order_by, count и срезы. Для среза [a:b] из каждого источника читается
+    не больше b постов, после чего источники сливаются по дате.
+    """
+
+    ordered = True
+
+    def __init__(self, streams, ordering=('-feed_date', '-feed_post')):
+        self.streams = streams
+        self.ordering = tuple(ordering)
+
+    def filter(self, *args, **kwargs):
+        return MergedFeed(
+            [stream.filter(*args, **kwargs) for stream in self.streams],
+            self.ordering,
+        )
+
+    def exclude(self, *args, **kwargs):
+        return MergedFeed(
+            [stream.exclude(*args, **kwargs) for stream in self.streams],
+            self.ordering,
+        )
+
+    def select_related(self, *fields):
+        return MergedFeed(
+            [stream.select_related(*fields) for stream in self.streams],
+            self.ordering,
+        )
+
+    def order_by(self, *fields):
+        return MergedFeed(self.streams, fields)
+
+    def count(self):
+        return sum(stream.count() for stream in self.streams)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:self.count()])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        merged = heapq.merge(
+            *(
+                stream.order_by(*self.ordering)[:stop]
+                for stream in self.streams
+            ),
+            key=attrgetter(*(field.lstrip('-') for field in self.ordering)),
+            reverse=self.ordering[0].startswith('-'),
+        )
+        return list(islice(merged, start, stop))
+
+
+# Последние посты автора во все ленты его подписчиков одним запросом
+BACKFILL_SQL = '''
+    INSERT OR IGNORE INTO {timeline} (user_id, post_id, pub_date)
+    SELECT follow.user_id, post.id, post.pub_date
+    FROM {follow} AS follow CROSS JOIN (
+        SELECT id, pub_date FROM {post} WHERE author_id = %s
+        ORDER BY pub_date DESC, id DESC LIMIT %s
+    ) AS post
+    WHERE follow.author_id = %s
+'''
+
+
+def _trim(users, params):
+    table = TimelineEntry._meta.db_table
+    sql = TRIM_SQL.format(table=table, users=users)
+    connection = connections[router.db_for_write(TimelineEntry)]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, settings.POSTS_TIMELINE_SIZE])
+
+
+def trim(user_id):
+    """Оставляет в ленте пользователя только последние записи."""
+    _trim('user_id = %s', [user_id])
+
+
+def trim_followers(author_id):
+    """То же для лент всех подписчиков автора — одним запросом."""
+    _trim(
+        'user_id IN (SELECT user_id FROM {} WHERE author_id = %s)'.format(
+            Follow._meta.db_table
+        ),
+        [author_id],
+    )
+
+
+def is_pulled(author_id):
+    """Посты автора не раскладываются, а читаются из его ленты."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.POSTS_TIMELINE_PUSH_LIMIT,
+    ).exists()
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Посты авторов с огромным числом подписчиков не раскладываются,
+    а подмешиваются в ленту при чтении, см. follow_feed_posts.
+    """
+    if is_pulled(post.author_id):
+        return
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers
+        ],
+        ignore_conflicts=True,
+    )
+    trim_followers(post.author_id)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора при подписке."""
+    posts = Post.objects.filter(author_id=author_id).only(
+        'pk', 'pub_date'
+    )[:settings.POSTS_TIMELINE_SIZE]
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for post in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim(user_id)
+
+
+def backfill_followers(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков.
+
+    Нужна, когда автор опускается до POSTS_TIMELINE_PUSH_LIMIT
+    подписчиков: его посты, пока он читался напрямую, в ленты
+    не попадали и без этого пропали бы из них.
+    """
+    sql = BACKFILL_SQL.format(
+        timeline=TimelineEntry._meta.db_table,
+        follow=Follow._meta.db_table,
+        post=Post._meta.db_table,
+    )
+    connection = connections[router.db_for_write(TimelineEntry)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            sql, [author_id, settings.POSTS_TIMELINE_SIZE, author_id]
+        )
+    trim_followers(author_id)
+
+
+def remove_author(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def timeline_posts(user):
+    """Посты из материализованной ленты в порядке её записей."""
+    return Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post'),
+    ).order_by('-feed_date', '-feed_post')
+
+
+def author_posts(author_id):
+    """Посты автора с теми же полями ключа, что у ленты."""
+    return Post.objects.filter(author_id=author_id).annotate(
+        feed_date=F('pub_date'), feed_post=F('pk'),
+    ).order_by('-feed_date', '-feed_post')
+
+
+def pulled_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются напрямую."""
+    return list(Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=settings.POSTS_TIMELINE_PUSH_LIMIT,
+    ).values_list('author_id', flat=True))
+
+
+def follow_feed_posts(user):
+    """Лента подписок: материализованная часть плюс потоки авторов."""
+    pulled = pulled_authors(user)
+    if not pulled:
+        return timeline_posts(user)
+    streams = [timeline_posts(user).exclude(author_id__in=pulled)]
+    streams.extend(author_posts(author_id) for author_id in pulled)
+    return MergedFeed(streams)
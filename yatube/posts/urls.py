@@ -4,11 +4,23 @@ from . import views
 
 app_name = 'posts'
 
+# Сколько запросов к БД может сделать маршрут при холодном кэше,
+# считая загрузку сессии и пользователя
+query_budgets = {
+    'index': 5,
+    'group_list': 5,
+    'profile': 6,
+    'post_detail': 5,
+    'follow_index': 5,
+    'search': 4,
+}
+
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('search/', views.search, name='search'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path(
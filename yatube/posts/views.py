@@ -1,50 +1,74 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.conf import settings
+
+from core.writer import write
 
 from .models import Post, Group, User, Follow
+from .caching import cache_anonymous_page, render_cards, tag_response
+from .counts import author_feed, follow_feed, group_feed, index_feed
 from .forms import CommentForm, PostForm
+from .paginators import CursorPaginator, WindowedPaginator
+from .search import search as search_posts
+from .thumbnails import attach_thumbnails, schedule
+from .timeline import FEED_KEY, follow_feed_posts
 
 NUM_VIEW_POST = 10
 
 
+def paginate(request, post_list, feed=None, key=None):
+    cursor = request.GET.get('cursor')
+    if cursor is not None or settings.POSTS_CURSOR_PAGINATION:
+        paginator = CursorPaginator(post_list, NUM_VIEW_POST, feed, key)
+        return paginator.get_page(cursor)
+    paginator = WindowedPaginator(post_list, NUM_VIEW_POST, feed)
+    page_number = request.GET.get('page')
+    return paginator.get_page(page_number)
+
+
+@cache_anonymous_page
 def index(request):
     template = 'posts/index.html'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, NUM_VIEW_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.select_related('author', 'group')
+    page_obj = paginate(request, post_list, index_feed())
+    attach_thumbnails(page_obj)
+    render_cards(page_obj)
     context = {
         'page_obj': page_obj
     }
-    return render(request, template, context)
+    return tag_response(render(request, template, context), 'index')
 
 
+@cache_anonymous_page
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, NUM_VIEW_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = group.posts.select_related('author', 'group')
+    page_obj = paginate(request, post_list, group_feed(group.pk))
+    attach_thumbnails(page_obj)
+    render_cards(page_obj, group)
     template = 'posts/group_list.html'
     context = {
         'group': group,
         'page_obj': page_obj,
     }
-    return render(request, template, context)
+    response = render(request, template, context)
+    return tag_response(response, f'group:{group.pk}')
 
 
+@cache_anonymous_page
 def profile(request, username):
-    author_posts = get_object_or_404(User, username=username)
-    post_list = author_posts.posts.all()
-    paginator = Paginator(post_list, NUM_VIEW_POST)
+    author_posts = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    post_list = author_posts.posts.select_related('author', 'group')
     is_following = request.user.is_authenticated and Follow.objects.filter(
         user=request.user,
         author=author_posts,
     ).exists()
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    count = post_list.count()
+    page_obj = paginate(request, post_list, author_feed(author_posts.pk))
+    attach_thumbnails(page_obj)
+    render_cards(page_obj)
+    count = author_posts.stats.posts_count
     it_is_me = request.user == author_posts
     context = {
         'author': author_posts,
@@ -54,15 +78,19 @@ def profile(request, username):
         'it_is_me': it_is_me,
     }
     template = 'posts/profile.html'
-    return render(request, template, context)
+    response = render(request, template, context)
+    return tag_response(response, f'author:{author_posts.pk}')
 
 
+@cache_anonymous_page
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    attach_thumbnails([post])
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
-    post_list = post.author.posts.all()
-    count = post_list.count()
+    comments = post.comments.select_related('author')
+    count = post.author.stats.posts_count
     context = {
         'post': post,
         'count': count,
@@ -70,16 +98,34 @@ def post_detail(request, post_id):
         'comments': comments,
     }
     template = 'posts/post_detail.html'
+    response = render(request, template, context)
+    return tag_response(
+        response, f'post:{post.pk}', f'author:{post.author_id}'
+    )
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search_posts(
+        query, request.GET.get('cursor'), NUM_VIEW_POST
+    )
+    attach_thumbnails(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    template = 'posts/search.html'
     return render(request, template, context)
 
 
 @login_required
 def post_create(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+        write(post.save)
+        schedule(post)
         return redirect('posts:profile', username=request.user)
     context = {
         'is_edit': False,
@@ -100,7 +146,9 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            schedule(post)
         return redirect('posts:post_detail', post_id)
     template = 'posts/create_post.html'
     context = {
@@ -119,16 +167,20 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        write(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, NUM_VIEW_POST)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = follow_feed_posts(request.user).select_related(
+        'author', 'group'
+    )
+    page_obj = paginate(
+        request, post_list, follow_feed(request.user.pk), FEED_KEY
+    )
+    attach_thumbnails(page_obj)
+    render_cards(page_obj)
     context = {
         'page_obj': page_obj,
     }
@@ -140,7 +192,8 @@ def follow_index(request):
 def profile_follow(request, username):
     user = get_object_or_404(User, username=username)
     if request.user != user:
-        obj, created = Follow.objects.get_or_create(
+        write(
+            Follow.objects.get_or_create,
             user=request.user,
             author=user
         )
@@ -40,6 +40,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # до сессий: запись сессии тоже закрепляет чтение за основной базой
+    'core.middleware.PrimaryPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -47,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.WriterBusyMiddleware',
 ]
 
 INTERNAL_IPS = [
@@ -83,9 +86,54 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение живёт между запросами своего потока
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Чтение идёт с реплик, запись — в default (core.routers). Реплику на
+# SQLite можно поднять копией базы: python manage.py sync_replicas
+# DATABASES['replica'] = {
+#     'ENGINE': 'django.db.backends.sqlite3',
+#     'NAME': os.path.join(BASE_DIR, 'replica.sqlite3'),
+#     'CONN_MAX_AGE': 60,
+#     'TEST': {'MIRROR': 'default'},
+# }
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы
+DATABASE_PIN_SECONDS = 5
+# Записи каких приложений закрепляют чтение: служебные записи (миниатюры
+# sorl при GET, журнал сбросов кэша) не должны ставить куку читателям.
+# Сессия пишется при входе и выходе: после них нужна своя свежая сессия
+DATABASE_PIN_APPS = ['posts', 'auth', 'sessions']
+# Служебные приложения всегда читают с основной базы: журнал сбросов
+# кэша, учёт файлов и хранилище миниатюр sorl не ждут синхронизации реплик
+DATABASE_PRIMARY_APPS = ['core', 'thumbnail']
+
+# Применяются к каждому новому соединению с SQLite (core.sqlite)
+SQLITE_PRAGMAS = {
+    # читатели не ждут писателя
+    'journal_mode': 'wal',
+    # в WAL этого достаточно: теряется только последний коммит при сбое ОС
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    # в КиБ, если отрицательное
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'memory',
+}
+
+# Записи постов, комментариев и подписок идут через один поток записи
+# на процесс (core.writer) и фиксируются пачками
+DB_WRITER_ENABLED = False
+# Сколько записей может ждать в очереди
+DB_WRITER_QUEUE_SIZE = 200
+# Сколько записей фиксируется одной транзакцией
+DB_WRITER_BATCH_SIZE = 50
+# Сколько секунд запрос ждёт места в очереди, прежде чем получить 503
+DB_WRITER_PUT_TIMEOUT = 2
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -151,3 +199,87 @@ CACHES = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+# Общий для всех воркеров узла кэш (см. python manage.py cache_benchmark):
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'core.cache.SQLiteCache',
+#         'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+#         'OPTIONS': {
+#             'MAX_ENTRIES': 100000,
+#             'MAX_SIZE': 256 * 1024 * 1024,
+#         },
+#     }
+# }
+# На нескольких узлах — L1 в процессе перед общим L2 (алиас 'shared')
+# со сбросами через таблицу core.InvalidationLog:
+# CACHES = {
+#     'default': {
+#         'BACKEND': 'core.cache.TieredCache',
+#         'LOCATION': 'shared',
+#         'OPTIONS': {'L1_MAX_ENTRIES': 1000, 'POLL_INTERVAL': 1},
+#     },
+#     'shared': {
+#         'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+#         'LOCATION': '127.0.0.1:11211',
+#     },
+# }
+
+# Курсорная пагинация лент (?cursor=) вместо номеров страниц
+POSTS_CURSOR_PAGINATION = False
+
+# Кэш числа постов в лентах, сбрасывается при изменении постов и подписок
+POSTS_COUNT_CACHE_TIMEOUT = 60 * 60
+# Начиная с этого размера таблицы общая лента берёт оценку из статистики СУБД.
+# Статистику обновляет python manage.py analyze_db: без неё оценки нет, а
+# без регулярного запуска (cron, раз в час) она устаревает
+POSTS_ESTIMATED_COUNT_MIN = 100000
+# Дальше этого числа отфильтрованные строки в админке не пересчитываются
+POSTS_ADMIN_COUNT_LIMIT = 10000
+
+# Сколько последних постов хранится в материализованной ленте подписок
+POSTS_TIMELINE_SIZE = 1000
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении
+POSTS_TIMELINE_PUSH_LIMIT = 5000
+
+# Бюджеты запросов к БД объявлены рядом с маршрутами в этих модулях
+QUERY_BUDGET_URLCONFS = ('posts.urls',)
+# Превышение бюджета: True — ошибка, False — предупреждение в лог
+QUERY_BUDGET_STRICT = False
+# Проверка бюджетов — инструмент разработки: в бою запросы не записываются
+QUERY_BUDGET_ENABLED = DEBUG
+if QUERY_BUDGET_ENABLED:
+    MIDDLEWARE.insert(
+        MIDDLEWARE.index('core.middleware.WriterBusyMiddleware'),
+        'core.middleware.QueryBudgetMiddleware',
+    )
+
+# Сколько живут отрендеренные карточки постов
+POSTS_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+# Страховочный срок жизни страниц для анонимов: сбрасываются они при записи
+POSTS_PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Защита от одновременного пересчёта кэша (posts.caching.cached):
+# сколько держится блокировка пересчёта
+POSTS_CACHE_LOCK_TIMEOUT = 10
+# сколько ждать чужой пересчёт, когда отдать нечего
+POSTS_CACHE_LOCK_WAIT = 2
+# сколько устаревшее значение ещё можно отдавать после срока
+POSTS_CACHE_STALE_TIMEOUT = 60 * 5
+# насколько охотно значения пересчитываются досрочно (1 — обычно)
+POSTS_CACHE_EARLY_BETA = 1
+
+# Миниатюры создаются в фоновых потоках сразу после сохранения картинки.
+# POSTS_THUMBNAILS_ASYNC=0 в окружении — синхронно, прямо в запросе
+POSTS_THUMBNAILS_ASYNC = os.environ.get('POSTS_THUMBNAILS_ASYNC', '1') != '0'
+POSTS_THUMBNAIL_WORKERS = 2
+# Загруженные оригиналы уменьшаются до этого размера по большей стороне
+# и перекодируются в пуле процессов
+POSTS_IMAGE_MAX_SIZE = 2560
+POSTS_IMAGE_QUALITY = 85
+POSTS_IMAGE_INGEST_PROCESSES = 2
+
+# Загрузки хранятся по хэшу содержимого (core.storage), миниатюры sorl —
+# в обычном хранилище под своими именами
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'